@@ -6,25 +6,143 @@ import streamlit as st
 import pandas as pd
 from io import BytesIO
 
-from configuration import criteria, ADMIN_USERS, credentials, RATING_OPTIONS, candidates
+from configuration import ADMIN_USERS, get_credentials
 from ui_feedback import format_timestamp
-from feedback_storage import get_feedback_status
+from feedback_storage import (
+    failed_write_count,
+    feedback_read_at,
+    get_feedback_version,
+    load_feedback,
+    refresh_aggregates,
+    storage_read_only,
+)
+from aggregates import (
+    empty_aggregates,
+    get_aggregates,
+    get_entry_statuses,
+    needs_rebuild,
+)
+from scoring import get_scores
+from notes_search import has_search_index, rebuild_search_index
+from feedback_explorer import (
+    build_feedback_df,
+    get_feedback_index,
+    show_feedback_explorer,
+    show_notes_search,
+)
 
 
-def calculate_criteria_avg_rating(
-    criteria_ratings: dict, criteria_list, rating_map, FIRST_OPTION
-) -> float:
-    vals = []
-    for crit in criteria_list:
-        val = criteria_ratings.get(crit, "")
-        if val != FIRST_OPTION and val in rating_map:
-            vals.append(rating_map[val])
-    return round(sum(vals) / len(vals), 2) if vals else ""
+def build_calibration_df(scores):
+    """
+    Build a per-interviewer table of mean rating and spread, to spot harsh vs lenient raters.
+    """
+    rows = []
+    for i, interviewer in enumerate(scores["interviewers"]):
+        if not scores["interviewer_count"][i]:
+            continue
+        rows.append(
+            {
+                "Interviewer": interviewer,
+                "Rated_Criteria": int(scores["interviewer_count"][i]),
+                "Mean_Rating": round(float(scores["interviewer_mean"][i]), 2),
+                "Std_Rating": round(float(scores["interviewer_std"][i]), 2),
+            }
+        )
+    calibration_df = pd.DataFrame(rows)
+    if not calibration_df.empty:
+        overall_mean = calibration_df["Mean_Rating"].mean()
+        calibration_df["Leniency"] = (
+            calibration_df["Mean_Rating"] - overall_mean
+        ).round(2)
+    return calibration_df
+
+
+def build_agreement_df(scores, candidates_dict):
+    """
+    Build a candidate x criterion table of rating mean, variance and inter-rater agreement.
+    """
+    rows = []
+    for c, cid in enumerate(scores["candidate_ids"]):
+        for k, crit in enumerate(scores["criteria"]):
+            count = int(scores["criterion_count"][c, k])
+            if not count:
+                continue
+            rows.append(
+                {
+                    "Candidate_Name": candidates_dict.get(cid, f"Unknown_{cid}"),
+                    "Criterion": crit,
+                    "Ratings": count,
+                    "Mean_Rating": round(float(scores["criterion_mean"][c, k]), 2),
+                    "Variance": round(float(scores["criterion_variance"][c, k]), 2),
+                    "Agreement": round(float(scores["agreement"][c, k]), 2),
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def build_candidate_summary_df(aggregates, rubric, notes_by_candidate=None):
+    """
+    Build the per-candidate summary of submitted reviews from the materialized aggregates.
+    notes_by_candidate: optional candidate name -> joined overall notes, for the export.
+    """
+    rows = []
+    for cid, bucket in aggregates["candidates"].items():
+        if not bucket["submitted"]:
+            continue
+        cname = rubric.candidates.get(cid, f"Unknown_{cid}")
+        row = {
+            "Candidate_Name": cname,
+            "Count_Submitted_Reviews": bucket["submitted"],
+        }
+        for r in rubric.rating_options[1:]:
+            row[f"Overall_Count_{r}"] = bucket["overall_counts"].get(r, 0)
+        if notes_by_candidate is not None:
+            row["Overall_Notes"] = notes_by_candidate.get(cname, "")
+        row["Avg_Of_Interviewer_Avg"] = (
+            round(bucket["avg_sum"] / bucket["avg_count"], 2)
+            if bucket["avg_count"]
+            else ""
+        )
+        for crit in rubric.criteria_list:
+            crit_counts = bucket["criteria_counts"].get(crit, {})
+            for r in rubric.rating_options[1:]:
+                row[f"{crit}_Count_{r}"] = crit_counts.get(r, 0)
+        rows.append(row)
+    candidate_summary_df = pd.DataFrame(rows)
+    if not candidate_summary_df.empty:
+        candidate_summary_df = candidate_summary_df.sort_values("Candidate_Name")
+    return candidate_summary_df
+
+
+def build_interviewer_summary_df(aggregates, rubric):
+    """
+    Build the per-interviewer summary of submitted and started reviews from the aggregates.
+    """
+    rows = []
+    for interviewer, bucket in sorted(aggregates["interviewers"].items()):
+        if not bucket["submitted"] and not bucket["in_progress"]:
+            continue
+        row = {
+            "Interviewer": interviewer,
+            "Count_Submitted_Reviews": bucket["submitted"],
+            "Count_Started_Reviews": bucket["in_progress"],
+        }
+        for r in rubric.rating_options[1:]:
+            row[f"Count_Overall_Rating_{r}"] = bucket["overall_counts"].get(r, 0)
+        rows.append(row)
+    return pd.DataFrame(rows)
 
 
-def export_feedback_to_excel(feedback_df, criteria_list, rating_options):
+def export_feedback_to_excel(
+    feedback_df,
+    candidate_summary_df,
+    interviewer_summary_df,
+    calibration_df=None,
+    agreement_df=None,
+):
     """
-    Export the feedback DataFrame to Excel with candidate and interviewer summaries.
+    Export the feedback DataFrame to Excel with candidate and interviewer summaries,
+    plus rater calibration and criteria agreement sheets when given.
     Returns the Excel file as bytes.
     """
     # Ensure Criteria_Avg_Rating is numeric for the whole DataFrame
@@ -39,86 +157,71 @@ def export_feedback_to_excel(feedback_df, criteria_list, rating_options):
         )
         # Only write the DataFrame, which will write a single header row
         feedback_df_sorted.to_excel(writer, sheet_name="All_Feedback", index=False)
-        # Candidate summary
         if not feedback_df.empty:
-            candidate_summary = []
-            for cname in feedback_df["Candidate_Name"].unique():
-                cdf = feedback_df[feedback_df["Candidate_Name"] == cname]
-                row = {
-                    "Candidate_Name": cname,
-                    "Count_Submitted_Reviews": len(cdf),
-                }
-                for r in rating_options[1:]:
-                    row[f"Overall_Count_{r}"] = (cdf["Overall_Rating"] == r).sum()
-                row["Overall_Notes"] = "; ".join(
-                    [str(x) for x in cdf["Overall_Notes"] if x]
-                )
-                # Ensure numeric for mean calculation
-                avg_col = pd.to_numeric(cdf["Criteria_Avg_Rating"], errors="coerce")
-                row["Avg_Of_Interviewer_Avg"] = (
-                    round(avg_col.mean(), 2) if not cdf.empty else ""
-                )
-                for crit in criteria_list:
-                    for r in rating_options[1:]:
-                        row[f"{crit}_Count_{r}"] = (cdf[f"{crit}_Rating"] == r).sum()
-                candidate_summary.append(row)
-            candidate_summary_df = pd.DataFrame(candidate_summary)
             candidate_summary_df.to_excel(
                 writer, sheet_name="Candidate_Summary", index=False
             )
-            interviewer_summary = []
-            for interviewer in feedback_df["Interviewer"].unique():
-                idf = feedback_df[feedback_df["Interviewer"] == interviewer]
-                submitted_count = len(idf)
-
-                def is_in_progress(row):
-                    feedback_entry = (
-                        st.session_state["feedback"]
-                        .get(row["Interviewer"], {})
-                        .get(str(row["Candidate_ID"]), {})
-                    )
-                    return get_feedback_status(feedback_entry) == "in_progress"
-
-                started_count = idf.apply(is_in_progress, axis=1).sum()
-                row = {
-                    "Interviewer": interviewer,
-                    "Count_Submitted_Reviews": submitted_count,
-                    "Count_Started_Reviews": started_count,
-                }
-                for r in rating_options[1:]:
-                    row[f"Count_Overall_Rating_{r}"] = (
-                        idf["Overall_Rating"] == r
-                    ).sum()
-                interviewer_summary.append(row)
-            interviewer_summary_df = pd.DataFrame(interviewer_summary)
             interviewer_summary_df.to_excel(
                 writer, sheet_name="Interviewer_Summary", index=False
             )
+        if calibration_df is not None and not calibration_df.empty:
+            calibration_df.to_excel(writer, sheet_name="Rater_Calibration", index=False)
+        if agreement_df is not None and not agreement_df.empty:
+            agreement_df.to_excel(writer, sheet_name="Criteria_Agreement", index=False)
     return output.getvalue()
 
 
-def show_admin_dashboard():
+def show_admin_dashboard(rubric):
     """
-    Display the admin dashboard, including the feedback completion matrix and all feedback details.
+    Display the admin dashboard, including the feedback completion matrix and the feedback explorer.
     Shows summary tables and allows export to Excel.
     """
+    candidates = rubric.candidates
     st.header("Admin Dashboard", anchor=None)
+    if failed_write_count():
+        st.error(
+            f"{failed_write_count()} change(s) held during a Google Sheets outage were rejected by the sheet and not saved. See the server log for details."
+        )
+    if st.button("🔄 Reload feedback from sheet", key="reload_feedback"):
+        st.session_state.pop("_cached_feedback", None)
+        st.session_state["feedback"] = load_feedback()
+        # A cached snapshot may be partial; keep the aggregates built from the sheet
+        if not storage_read_only():
+            refresh_aggregates(st.session_state["feedback"], rubric, feedback_read_at())
+            rebuild_search_index(st.session_state["feedback"], feedback_read_at())
+    # Like the aggregates, never build the shared index from a partial snapshot
+    if not has_search_index() and not storage_read_only():
+        rebuild_search_index(st.session_state["feedback"], feedback_read_at())
+    aggregates = get_aggregates()
+    if needs_rebuild(aggregates, rubric) and not storage_read_only():
+        # Rebuild from a fresh read: this session's copy predates any saves
+        # made since the admin logged in
+        st.session_state.pop("_cached_feedback", None)
+        st.session_state["feedback"] = load_feedback()
+        if not storage_read_only():
+            aggregates = refresh_aggregates(
+                st.session_state["feedback"], rubric, feedback_read_at()
+            )
+    if aggregates is None:
+        st.info("Summary counts will be built once Google Sheets is reachable.")
+        aggregates = empty_aggregates()
     st.header("Feedback Completion Matrix", anchor=None)
     completion_data = []
-    all_panelists = [u for u in credentials["usernames"] if u not in ADMIN_USERS]
+    all_panelists = [u for u in get_credentials()["usernames"] if u not in ADMIN_USERS]
+    statuses = get_entry_statuses(all_panelists, list(candidates))
     for panelist in all_panelists:
         row = {"Interviewer": panelist}
-        user_feedback = st.session_state["feedback"].get(panelist, {})
+        user_entries = statuses[panelist]
         for cid_str, cname in candidates.items():
-            feedback_entry = user_feedback.get(cid_str, {})
-            status_code = get_feedback_status(feedback_entry)
+            entry = user_entries.get(cid_str, {})
+            status_code = entry.get("status", "not_started")
             if status_code == "submitted":
                 status = "✅ Submitted"
             elif status_code == "in_progress":
                 status = "📝 In Progress"
             else:
                 status = "❌ Not Started"
-            last_modified = feedback_entry.get("timestamp", "")
+            last_modified = entry.get("timestamp", "")
             row[cname] = status
             row[f"{cname} Last Modified At"] = (
                 format_timestamp(last_modified) if last_modified else ""
@@ -131,83 +234,68 @@ def show_admin_dashboard():
         )
         st.dataframe(completion_df, use_container_width=True)
 
-    st.header("All Feedback Details", anchor=None)
-    feedback_data = []
-    criteria_list = list(criteria.keys())
-    FIRST_OPTION = RATING_OPTIONS[0] if RATING_OPTIONS else None
-    rating_map = {r: i for i, r in enumerate(RATING_OPTIONS[1:])}
-    for panelist, user_feedback in st.session_state["feedback"].items():
-        for candidate_id_str, feedback in user_feedback.items():
-            if not feedback.get("submitted", False):
-                continue  # Only include submitted feedback
-            candidate_name = candidates.get(
-                candidate_id_str, f"Unknown_{candidate_id_str}"
-            )
-            row_data = {
-                "Interviewer": panelist,
-                "Candidate_ID": candidate_id_str,
-                "Candidate_Name": candidate_name,
-                "Overall_Rating": feedback.get("overall_rating", ""),
-                "Overall_Notes": feedback.get("overall_notes", ""),
-                "Last_Modified_At": feedback.get("timestamp", ""),
-            }
-            criteria_ratings = feedback.get("criteria_ratings", {})
-            criteria_notes = feedback.get("criteria_notes", {})
-            for criterion in criteria_list:
-                val = criteria_ratings.get(criterion, "")
-                row_data[f"{criterion}_Rating"] = val
-                row_data[f"{criterion}_Notes"] = criteria_notes.get(criterion, "")
-            row_data["Criteria_Avg_Rating"] = calculate_criteria_avg_rating(
-                criteria_ratings, criteria_list, rating_map, FIRST_OPTION
-            )
-            feedback_data.append(row_data)
-    feedback_df = pd.DataFrame(feedback_data)
-    if not feedback_df.empty:
-        if "Last_Modified_At" in feedback_df.columns:
-            feedback_df["Last_Modified_At"] = feedback_df["Last_Modified_At"].apply(
-                format_timestamp
-            )
-        st.caption("Double-click a Notes cell to view all the text if it is truncated.")
-        cols = feedback_df.columns.tolist()
-        if "Candidate_Name" in cols and "Interviewer" in cols:
-            crit_cols = [
-                c for c in cols if c.endswith("_Rating") and c != "Criteria_Avg_Rating"
-            ]
-            new_order = ["Candidate_Name", "Interviewer"]
-            if "Criteria_Avg_Rating" in cols and crit_cols:
-                first_crit = crit_cols[0]
-                idx = cols.index(first_crit)
-                for c in cols:
-                    if c not in new_order and c != "Criteria_Avg_Rating":
-                        new_order.append(c)
-                new_order.insert(idx, "Criteria_Avg_Rating")
-                feedback_df = feedback_df[
-                    [col for col in new_order if col in feedback_df.columns]
-                ]
-            else:
-                new_order += [c for c in cols if c not in new_order]
-                feedback_df = feedback_df[new_order]
-        # Ensure Criteria_Avg_Rating is numeric for display as well
-        if "Criteria_Avg_Rating" in feedback_df.columns:
-            feedback_df["Criteria_Avg_Rating"] = pd.to_numeric(
-                feedback_df["Criteria_Avg_Rating"], errors="coerce"
-            )
-        st.dataframe(feedback_df, use_container_width=True)
-        st.subheader("📤 Export to Excel", anchor=None)
-        st.caption(
-            "The Excel file will contain three sheets: (1) All submitted feedback, (2) summary by candidate with numeric averages, and (3) summary by interviewer."
-        )
+    st.header("Candidate Summary", anchor=None)
+    st.caption(
+        "Counts of submitted overall ratings and the average of each interviewer's Criteria Avg Rating."
+    )
+    st.dataframe(
+        build_candidate_summary_df(aggregates, rubric), use_container_width=True
+    )
+
+    feedback = st.session_state["feedback"]
+    feedback_version = get_feedback_version()
+    scores = get_scores(feedback, rubric, feedback_version)
+    index = get_feedback_index(feedback, rubric, feedback_version)
+    show_notes_search(rubric)
+    show_feedback_explorer(feedback, index, rubric, scores)
+    if not index["keys"]:
+        return
+
+    st.header("Rater Calibration", anchor=None)
+    st.caption(
+        "Mean and spread of each interviewer's criteria ratings. Negative 'Leniency' means harsher than the panel average. 'Calibrated_Avg_Z' in the explorer rescores each entry against its interviewer's own mean and spread."
+    )
+    calibration_df = build_calibration_df(scores)
+    st.dataframe(calibration_df, use_container_width=True)
+    st.header("Criteria Agreement", anchor=None)
+    st.caption(
+        "Variance of ratings across interviewers, and 'Agreement': the share of interviewer pairs that gave the same rating."
+    )
+    agreement_df = build_agreement_df(scores, candidates)
+    st.dataframe(agreement_df, use_container_width=True)
+
+    st.subheader("📤 Export to Excel", anchor=None)
+    st.caption(
+        "The Excel file will contain five sheets: (1) All submitted feedback, (2) summary by candidate with numeric averages, (3) summary by interviewer, (4) rater calibration, and (5) criteria agreement."
+    )
+    # The full feedback table is only built when an export is asked for, and
+    # kept until the feedback or rubric changes
+    export_key = (feedback_version, rubric.version)
+    export = st.session_state.get("_excel_export")
+    if st.button("Prepare Excel export", key="prepare_export"):
+        feedback_df = build_feedback_df(feedback, index["keys"], rubric, scores)
         try:
+            notes_by_candidate = feedback_df.groupby("Candidate_Name")[
+                "Overall_Notes"
+            ].agg(lambda notes: "; ".join(str(x) for x in notes if x))
             excel_data = export_feedback_to_excel(
-                feedback_df, criteria_list, RATING_OPTIONS
-            )
-            st.download_button(
-                label="📋 Download as Excel",
-                data=excel_data,
-                file_name=f"interview_feedback_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                feedback_df,
+                build_candidate_summary_df(aggregates, rubric, notes_by_candidate),
+                build_interviewer_summary_df(aggregates, rubric),
+                calibration_df,
+                agreement_df,
             )
         except ImportError:
             st.error(
                 "Excel export requires openpyxl. Install with: pip install openpyxl"
             )
+            return
+        export = (export_key, excel_data)
+        st.session_state["_excel_export"] = export
+    if export and export[0] == export_key:
+        st.download_button(
+            label="📋 Download as Excel",
+            data=export[1],
+            file_name=f"interview_feedback_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
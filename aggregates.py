@@ -0,0 +1,253 @@
+"""
+Materialized feedback aggregates for the admin dashboard.
+
+Per-candidate and per-interviewer counters, rating histograms, sums for averages
+and last-modified times are updated incrementally whenever an entry is saved, so
+admin views read them directly instead of rescanning the raw feedback. The store
+is shared by all sessions in the process and persisted to a local JSON file.
+
+A rebuild works from a sheet read taken some time before it swaps the store in,
+so every recorded entry is also kept, with the time it was recorded, in "recent"
+(one per entry); saves recorded after the read started are replayed on top.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from configuration import AGGREGATES_PATH
+from scoring import entry_criteria_avg
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_store = {"aggregates": None, "recent": {}}
+
+
+def rubric_fingerprint(rubric):
+    """
+    Identify the parts of the rubric the aggregates depend on, so editing only
+    the candidates or descriptions does not force a rebuild.
+    """
+    key = json.dumps(
+        [rubric.criteria_list, rubric.rating_options, rubric.criteria_weights],
+        sort_keys=True,
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def empty_aggregates(fingerprint=""):
+    return {
+        "rubric_fingerprint": fingerprint,
+        "entries": {},
+        "candidates": {},
+        "interviewers": {},
+    }
+
+
+def _empty_bucket():
+    return {
+        "submitted": 0,
+        "in_progress": 0,
+        "overall_counts": {},
+        "criteria_counts": {},
+        "avg_sum": 0.0,
+        "avg_count": 0,
+        "last_modified": "",
+    }
+
+
+def entry_contribution(entry, status, rubric):
+    """
+    Reduce a feedback entry to what the aggregates count. Ratings only count
+    once the entry is submitted.
+    """
+    contribution = {
+        "status": status,
+        "timestamp": entry.get("timestamp", ""),
+        "overall_rating": "",
+        "criteria_ratings": {},
+        "criteria_avg": None,
+    }
+    if status == "submitted":
+        ratings = entry.get("criteria_ratings", {})
+        contribution["overall_rating"] = entry.get("overall_rating", "")
+        contribution["criteria_ratings"] = {
+            crit: ratings[crit] for crit in rubric.criteria_list if ratings.get(crit)
+        }
+        contribution["criteria_avg"] = entry_criteria_avg(entry, rubric)
+    return contribution
+
+
+def _bump(counts, key, sign):
+    if not key:
+        return
+    counts[key] = counts.get(key, 0) + sign
+    if not counts[key]:
+        del counts[key]
+
+
+def _apply(aggregates, user, candidate_id, contribution, sign):
+    """Add (sign=1) or remove (sign=-1) one entry's contribution."""
+    buckets = (
+        aggregates["candidates"].setdefault(candidate_id, _empty_bucket()),
+        aggregates["interviewers"].setdefault(user, _empty_bucket()),
+    )
+    status = contribution["status"]
+    for bucket in buckets:
+        if status in ("submitted", "in_progress"):
+            bucket[status] += sign
+        if status == "submitted":
+            _bump(bucket["overall_counts"], contribution["overall_rating"], sign)
+            for crit, rating in contribution["criteria_ratings"].items():
+                _bump(bucket["criteria_counts"].setdefault(crit, {}), rating, sign)
+            if contribution["criteria_avg"] is not None:
+                bucket["avg_sum"] += sign * contribution["criteria_avg"]
+                bucket["avg_count"] += sign
+        # Last-modified only moves forward; saves always carry a newer timestamp
+        if sign > 0 and contribution["timestamp"] > bucket["last_modified"]:
+            bucket["last_modified"] = contribution["timestamp"]
+
+
+def _record(aggregates, user, candidate_id, contribution):
+    """
+    Replace one entry's contribution. Returns True if a status or rating changed,
+    False if nothing did or only the last-modified time moved.
+    """
+    user_entries = aggregates["entries"].setdefault(user, {})
+    previous = user_entries.get(candidate_id)
+    if previous == contribution:
+        return False
+    if previous is not None:
+        _apply(aggregates, user, candidate_id, previous, -1)
+    _apply(aggregates, user, candidate_id, contribution, 1)
+    user_entries[candidate_id] = contribution
+    counted = dict(contribution, timestamp=None)
+    return previous is None or dict(previous, timestamp=None) != counted
+
+
+def _persist(aggregates):
+    tmp_path = f"{AGGREGATES_PATH}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(aggregates, f)
+        os.replace(tmp_path, AGGREGATES_PATH)
+    except OSError as e:
+        # The sheet stays the source of truth; the file only saves a rebuild
+        logger.warning("Could not persist feedback aggregates: %s", e)
+
+
+def _load():
+    try:
+        with open(AGGREGATES_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _summary(aggregates):
+    """
+    Copy the per-candidate and per-interviewer buckets, without the per-entry
+    map, so a read costs O(candidates + interviewers).
+    """
+    if aggregates is None:
+        return None
+    return {
+        "rubric_fingerprint": aggregates["rubric_fingerprint"],
+        "candidates": copy.deepcopy(aggregates["candidates"]),
+        "interviewers": copy.deepcopy(aggregates["interviewers"]),
+    }
+
+
+def _ensure_loaded():
+    if _store["aggregates"] is None:
+        _store["aggregates"] = _load()
+    return _store["aggregates"]
+
+
+def get_aggregates():
+    """
+    Return a snapshot of the process-wide candidate and interviewer aggregates,
+    loading the persisted copy on first use. Returns None if nothing has been built yet.
+    """
+    with _lock:
+        return _summary(_ensure_loaded())
+
+
+def get_entry_statuses(users, candidate_ids):
+    """
+    Return {user: {candidate_id: {"status", "timestamp"}}} for the given users and
+    candidates, for the completion matrix. Missing entries are left out.
+    """
+    with _lock:
+        aggregates = _ensure_loaded()
+        entries = aggregates["entries"] if aggregates else {}
+        result = {}
+        for user in users:
+            user_entries = entries.get(user, {})
+            result[user] = {
+                cid: {
+                    "status": user_entries[cid]["status"],
+                    "timestamp": user_entries[cid]["timestamp"],
+                }
+                for cid in candidate_ids
+                if cid in user_entries
+            }
+        return result
+
+
+def needs_rebuild(aggregates, rubric):
+    return aggregates is None or aggregates.get(
+        "rubric_fingerprint"
+    ) != rubric_fingerprint(rubric)
+
+
+def record_entry(user, candidate_id, entry, status, rubric):
+    """
+    Incrementally update the aggregates for one saved entry. They are persisted
+    only when a status or rating changed: every autosave carries a new
+    timestamp, and writing the whole store on each one would make every save
+    O(all entries). The file may then lag on last-modified times.
+    """
+    fingerprint = rubric_fingerprint(rubric)
+    contribution = entry_contribution(entry, status, rubric)
+    with _lock:
+        _store["recent"][(user, candidate_id)] = (
+            time.monotonic(),
+            fingerprint,
+            contribution,
+        )
+        aggregates = _ensure_loaded()
+        if needs_rebuild(aggregates, rubric):
+            # Nothing consistent to update; the next admin view rebuilds
+            return
+        if _record(aggregates, user, candidate_id, contribution):
+            _persist(aggregates)
+
+
+def rebuild_aggregates(entries, rubric, since=None):
+    """
+    Rebuild the aggregates from scratch.
+    entries: iterable of (user, candidate_id, entry, status) tuples.
+    since: time.monotonic() when the entries were read; entries recorded since
+    then are applied on top, as the read may predate them.
+    """
+    fingerprint = rubric_fingerprint(rubric)
+    aggregates = empty_aggregates(fingerprint)
+    for user, candidate_id, entry, status in entries:
+        _record(
+            aggregates, user, candidate_id, entry_contribution(entry, status, rubric)
+        )
+    with _lock:
+        if since is not None:
+            recent = _store["recent"].items()
+            for key, (recorded_at, recorded_with, contribution) in recent:
+                if recorded_at >= since and recorded_with == fingerprint:
+                    _record(aggregates, *key, contribution)
+        _store["aggregates"] = aggregates
+        _persist(aggregates)
+        return _summary(aggregates)
@@ -1,14 +1,17 @@
 import streamlit as st
-from configuration import (
-    criteria,
-    ADMIN_USERS,
-    APP_EXPIRATION_DATE,
-    candidates,
-)
+from configuration import ADMIN_USERS, APP_EXPIRATION_DATE
 from authentication import authenticate_user, check_app_expiration, init_rate_limiting
-from feedback_storage import load_feedback
+from feedback_storage import (
+    check_storage,
+    load_feedback,
+    pending_write_count,
+    snapshot_time,
+    storage_read_only,
+)
+from ui_feedback import format_timestamp
 from user_panel import show_user_panel
 from admin_panel import show_admin_dashboard
+from rubric import get_rubric
 
 
 def initialize_app():
@@ -17,32 +20,41 @@ def initialize_app():
     init_rate_limiting()
 
 
-def initialize_session_state():
-    if "feedback" not in st.session_state:
-        st.session_state["feedback"] = load_feedback()
+def initialize_session_state(username):
+    # Admins load all feedback; panelists only what they are allowed to see
+    scope = None if username in ADMIN_USERS else username
+    st.session_state["feedback"] = load_feedback(scope)
 
 
-def calculate_criteria_avg_rating(
-    criteria_ratings: dict, criteria_list, rating_map, FIRST_OPTION
-) -> float:
-    vals = []
-    for crit in criteria_list:
-        val = criteria_ratings.get(crit, "")
-        if val != FIRST_OPTION and val in rating_map:
-            vals.append(rating_map[val])
-    return round(sum(vals) / len(vals), 2) if vals else ""
+def show_read_only_banner():
+    if not storage_read_only():
+        return
+    message = (
+        "⚠️ Read-only: Google Sheets is unavailable right now, so editing is paused. "
+    )
+    as_of = snapshot_time()
+    if as_of:
+        message += f"Showing feedback as of {format_timestamp(as_of)}. "
+    else:
+        message += "No saved feedback is available yet. "
+    if pending_write_count():
+        message += "Changes made before the outage are held and will be saved automatically once it is back."
+    st.warning(message)
 
 
 def main():
     initialize_app()
-    initialize_session_state()
     _, authentication_status, username, authenticator = authenticate_user()
     if authentication_status:
+        # Probe Sheets first if it has been failing, so this run sees it recover
+        check_storage()
+        initialize_session_state(username)
+        show_read_only_banner()
         authenticator.logout("Logout", "sidebar")
         if username in ADMIN_USERS:
-            show_admin_dashboard()
+            show_admin_dashboard(get_rubric())
         else:
-            show_user_panel(username, candidates, criteria)
+            show_user_panel(username, get_rubric())
     elif authentication_status is False:
         st.error("Username/password is incorrect")
     elif authentication_status is None:
@@ -0,0 +1,196 @@
+"""
+Archive of feedback rows moved out of the live sheet.
+
+Rows for closed candidates or expired panels are written to compressed JSON Lines
+files in ARCHIVE_DIR, with an index of which file holds each interviewer/candidate
+entry. Admin reports and the export read archived rows alongside the live sheet.
+
+Run as a command to archive rows now, or on a schedule:
+    python archive.py --candidates 1 2
+    python archive.py --older-than-days 90 --every-hours 24
+    python archive.py --expired
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from configuration import ARCHIVE_DIR, APP_EXPIRATION_DATE
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index.json"
+
+_lock = threading.Lock()
+_cache = {"mtime": None, "records": []}
+
+
+def _index_path():
+    return os.path.join(ARCHIVE_DIR, INDEX_NAME)
+
+
+def load_archive_index():
+    """
+    Return the archive index: {"files": [...], "entries": {interviewer: {candidate_id: file}}}.
+    """
+    try:
+        with open(_index_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files": [], "entries": {}}
+
+
+def select_rows_to_archive(records, candidate_ids=None, before=None, archive_all=False):
+    """
+    Return the indexes of records to archive: rows for any of candidate_ids, rows
+    of candidates whose rows were all last modified before the given datetime,
+    or every row if archive_all. A candidate with any row lacking a parseable
+    timestamp is never archived by age, and rows left blank by an earlier
+    archive are skipped.
+    """
+    candidate_ids = {str(cid) for cid in candidate_ids or ()}
+    rows_by_candidate = {}
+    stale = {}
+    for idx, record in enumerate(records):
+        candidate_id = str(record.get("Candidate_ID", ""))
+        if not record.get("Interviewer") or not candidate_id:
+            continue
+        rows_by_candidate.setdefault(candidate_id, []).append(idx)
+        if before is None:
+            continue
+        try:
+            modified = datetime.fromisoformat(str(record.get("Timestamp", "")))
+        except ValueError:
+            modified = None
+        # A candidate stays live while any panelist's entry is recent
+        stale[candidate_id] = (
+            stale.get(candidate_id, True) and modified is not None and modified < before
+        )
+    selected = []
+    for candidate_id, indexes in rows_by_candidate.items():
+        if archive_all or candidate_id in candidate_ids or stale.get(candidate_id):
+            selected.extend(indexes)
+    return sorted(selected)
+
+
+def write_archive(records, reason=""):
+    """
+    Write records (header -> value dicts) to a new compressed archive file and
+    add them to the index. Returns the file name.
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    created = datetime.now()
+    file_name = f"feedback-{created.strftime('%Y%m%dT%H%M%S%f')}.jsonl.gz"
+    with gzip.open(os.path.join(ARCHIVE_DIR, file_name), "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    with _lock:
+        index = load_archive_index()
+        index["files"].append(
+            {
+                "file": file_name,
+                "created": created.isoformat(),
+                "rows": len(records),
+                "reason": reason,
+                "candidates": sorted({str(r.get("Candidate_ID", "")) for r in records}),
+            }
+        )
+        for record in records:
+            index["entries"].setdefault(record.get("Interviewer", ""), {})[
+                str(record.get("Candidate_ID", ""))
+            ] = file_name
+        tmp_path = f"{_index_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, _index_path())
+    return file_name
+
+
+def load_archived_records():
+    """
+    Return the current archived record of every archived entry. The index names
+    the file holding each entry's latest copy, so files whose entries were all
+    archived again later are not read. Cached until the index changes.
+    """
+    try:
+        mtime = os.stat(_index_path()).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    with _lock:
+        if _cache["mtime"] != mtime:
+            wanted = {}
+            for interviewer, entries in load_archive_index()["entries"].items():
+                for candidate_id, file_name in entries.items():
+                    wanted.setdefault(file_name, set()).add((interviewer, candidate_id))
+            records = []
+            for file_name, keys in wanted.items():
+                path = os.path.join(ARCHIVE_DIR, file_name)
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        record = json.loads(line)
+                        key = (
+                            record.get("Interviewer", ""),
+                            str(record.get("Candidate_ID", "")),
+                        )
+                        if key in keys:
+                            records.append(record)
+            _cache.update(mtime=mtime, records=records)
+        return _cache["records"]
+
+
+def main():
+    # Imported here: feedback_storage reads this module's archive files
+    from feedback_storage import compact_feedback
+
+    parser = argparse.ArgumentParser(
+        description="Move closed or expired feedback rows out of the live sheet."
+    )
+    parser.add_argument(
+        "--candidates", nargs="*", default=[], help="candidate ids to archive"
+    )
+    parser.add_argument(
+        "--older-than-days",
+        type=float,
+        help="archive candidates whose rows were all last modified more than this many days ago",
+    )
+    parser.add_argument(
+        "--expired",
+        action="store_true",
+        help="archive every row once APP_EXPIRATION_DATE has passed",
+    )
+    parser.add_argument(
+        "--every-hours",
+        type=float,
+        help="keep running and archive on this schedule",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="report what would be archived"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    while True:
+        before = None
+        if args.older_than_days is not None:
+            before = datetime.now() - timedelta(days=args.older_than_days)
+        archive_all = args.expired and datetime.now() > APP_EXPIRATION_DATE
+        archived = compact_feedback(
+            args.candidates, before, archive_all, dry_run=args.dry_run
+        )
+        logger.info(
+            "%s %d rows", "Would archive" if args.dry_run else "Archived", archived
+        )
+        if not args.every_hours:
+            break
+        time.sleep(args.every_hours * 3600)
+
+
+if __name__ == "__main__":
+    main()
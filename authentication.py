@@ -47,9 +47,9 @@ def record_login_attempt(username, success=False):
 import streamlit as st
 import streamlit_authenticator as stauth
 from configuration import (
-    credentials,
+    get_credentials,
+    get_cookie_key,
     COOKIE_EXPIRY_DAYS,
-    COOKIE_KEY,
 )
 
 
@@ -58,7 +58,10 @@ def get_authenticator():
     # NOTE: This constructor signature is correct for streamlit-authenticator v0.1.5
     # pylint: disable=no-value-for-parameter
     return stauth.Authenticate(
-        credentials, "interview_panel_cookie", COOKIE_KEY, COOKIE_EXPIRY_DAYS
+        get_credentials(),
+        "interview_panel_cookie",
+        get_cookie_key(),
+        COOKIE_EXPIRY_DAYS,
     )
 
 
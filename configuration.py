@@ -1,6 +1,8 @@
 import streamlit_authenticator as stauth
 import streamlit as st
 from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
 
 # --- ENHANCED SECURITY CONFIGURATION ---
 
@@ -9,61 +11,45 @@ APP_EXPIRATION_DATE = datetime(2025, 8, 1)  # Adjust as needed
 ADMIN_USERS = ["admin"]
 COOKIE_EXPIRY_DAYS = 1  # Shorter expiry for security
 
-# Load secrets from Streamlit secrets
-COOKIE_KEY = st.secrets["COOKIE_KEY"]
-
 # Google sheet info
 # SHEET_NAME = "streamlit_interview_feedback"
 WORKSHEET_NAME = "Feedback"
 SHEET_KEY = "19w1h1fH7sOCkr6AgmYTKBuFfmSzYfAlcsi8vi9siHpQ"
 
-RATING_OPTIONS = [
-    "I can't tell",
-    "Low",
-    "Moderate",
-    "Strong",
-    "Exceptional",
-]
+# Circuit breaker for Google Sheets (see feedback_storage.py): consecutive failed
+# calls before the app goes read-only, and seconds before Sheets is probed again
+SHEETS_FAILURE_THRESHOLD = 3
+SHEETS_COOLDOWN_SECONDS = 30
+
+# Candidates, criteria and rating options live in this file (see rubric.py)
+RUBRIC_PATH = Path(__file__).with_name("rubric.yaml")
+
+# Local file holding the materialized admin dashboard aggregates (see aggregates.py)
+AGGREGATES_PATH = Path(__file__).with_name("feedback_aggregates.json")
+
+# Local directory for feedback rows archived out of the live sheet (see archive.py)
+ARCHIVE_DIR = Path(__file__).with_name("archive")
+
+
+# Secrets are read, and passwords hashed, on first use rather than at import
+@lru_cache(maxsize=None)
+def get_cookie_key():
+    return st.secrets["COOKIE_KEY"]
 
-# --- CONFIGURATION ---
-candidates = {"1": "Anne", "2": "Maria-Paula", "3": "Anastasia"}
-criteria = {
-    "User research": [
-        "Design and conduct mixed method studies, analyze complex data, synthesize findings, and translate insights into actionable recommendations/products for your role.",
-        "Expertise includes multiple methods for both quantitative and qualitative research approaches.",
-        "Data analytics is strong for both qualitative and quantitative methods (Python, R, Qualtrics StatsIQ, etc.)",
-        "Working with product/UX designers to create actionable research plans.",
-    ],
-    "Research ops": [
-        "Tracking and managing recruitment and participant pools (e.g., who has been invited via what channel for which studies, who participated, at what level of engagement), ideally with research-specific tools other than spreadsheets.",
-        "Managing research logistics (e.g., scheduling interviews, sending reminders, and ensuring participants have the necessary information).",
-        "Creating meaningful research inventory (e.g., tagging assets and presentations).",
-    ],
-    "Communication and collaboration": [
-        "Collaborating with cross-functional teams to ensure research design, analysis, and presentations meets business goals.",
-        "For example, how well can you understand their answer (if presented as non-technical)?",
-    ],
-    "ECE knowledge & empathy": [
-        "This is important because this position includes lots of engagement and interaction with Frog Street customers.",
-        "Ability to empathize and build rapport with early childhood educators and administrators.",
-        "Baseline ECE knowledge (such as awareness of trends, key issues, challenges, opportunities).",
-    ],
-    "Leadership & professional maturity": [
-        "Level of professional independence, judgment, and maturity in handling complex projects and stakeholders.",
-    ],
-}
 
-# Use strong, unique passwords (generate these once and store securely)
-usernames = st.secrets["credentials"]["usernames"]
-names = st.secrets["credentials"]["names"]
-secure_passwords = st.secrets["credentials"]["passwords"]
+@lru_cache(maxsize=None)
+def get_credentials():
+    # Use strong, unique passwords (generate these once and store securely)
+    usernames = st.secrets["credentials"]["usernames"]
+    names = st.secrets["credentials"]["names"]
+    secure_passwords = st.secrets["credentials"]["passwords"]
 
-# Hash the passwords - streamlit-authenticator 0.1.5 syntax
-hashed_passwords = stauth.Hasher(secure_passwords).generate()
+    # Hash the passwords - streamlit-authenticator 0.1.5 syntax
+    hashed_passwords = stauth.Hasher(secure_passwords).generate()
 
-credentials = {
-    "usernames": {
-        uname: {"name": n, "password": p}
-        for uname, n, p in zip(usernames, names, hashed_passwords)
+    return {
+        "usernames": {
+            uname: {"name": n, "password": p}
+            for uname, n, p in zip(usernames, names, hashed_passwords)
+        }
     }
-}
@@ -0,0 +1,295 @@
+"""
+Admin feedback explorer: filter submitted feedback by candidate, interviewer, rating
+and date through prebuilt indexes, and materialize only the visible page. Also the
+notes search box over the notes_search index.
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time
+
+import pandas as pd
+import streamlit as st
+
+from notes_search import OVERALL_FIELD, has_search_index, search_notes, tokenize
+from scoring import entry_score
+from ui_feedback import format_timestamp
+
+PAGE_SIZES = [10, 25, 50, 100]
+SNIPPET_CHARS = 160
+
+
+def feedback_columns(rubric):
+    """
+    Column order of the feedback details table: Criteria Avg Rating comes right
+    before the first criterion column.
+    """
+    columns = [
+        "Candidate_Name",
+        "Interviewer",
+        "Candidate_ID",
+        "Overall_Rating",
+        "Overall_Notes",
+        "Last_Modified_At",
+        "Criteria_Avg_Rating",
+        "Calibrated_Avg_Z",
+    ]
+    for criterion in rubric.criteria_list:
+        columns += [f"{criterion}_Rating", f"{criterion}_Notes"]
+    return columns
+
+
+def build_feedback_row(interviewer, candidate_id, feedback, rubric, scores):
+    """Build one row of the feedback details table for a submitted entry."""
+    row_data = {
+        "Interviewer": interviewer,
+        "Candidate_ID": candidate_id,
+        "Candidate_Name": rubric.candidates.get(
+            candidate_id, f"Unknown_{candidate_id}"
+        ),
+        "Overall_Rating": feedback.get("overall_rating", ""),
+        "Overall_Notes": feedback.get("overall_notes", ""),
+        "Last_Modified_At": format_timestamp(feedback.get("timestamp", "")),
+        "Criteria_Avg_Rating": entry_score(
+            scores, "criteria_avg", interviewer, candidate_id
+        ),
+        "Calibrated_Avg_Z": entry_score(
+            scores, "calibrated_avg", interviewer, candidate_id
+        ),
+    }
+    criteria_ratings = feedback.get("criteria_ratings", {})
+    criteria_notes = feedback.get("criteria_notes", {})
+    for criterion in rubric.criteria_list:
+        row_data[f"{criterion}_Rating"] = criteria_ratings.get(criterion, "")
+        row_data[f"{criterion}_Notes"] = criteria_notes.get(criterion, "")
+    return row_data
+
+
+def build_feedback_df(feedback, keys, rubric, scores):
+    """
+    Build the feedback details DataFrame for the given (interviewer, candidate_id) keys.
+    """
+    feedback_df = pd.DataFrame(
+        [
+            build_feedback_row(
+                interviewer, cid, feedback[interviewer][cid], rubric, scores
+            )
+            for interviewer, cid in keys
+        ],
+        columns=feedback_columns(rubric),
+    )
+    # Ensure the score columns are numeric
+    for col in ("Criteria_Avg_Rating", "Calibrated_Avg_Z"):
+        feedback_df[col] = pd.to_numeric(feedback_df[col], errors="coerce")
+    return feedback_df
+
+
+def build_feedback_index(feedback, rubric):
+    """
+    Index submitted entries by candidate, interviewer, overall rating and date.
+    Row ids point into "keys", which is ordered by candidate name, then interviewer.
+    """
+    submitted = sorted(
+        (
+            (rubric.candidates.get(cid, f"Unknown_{cid}"), interviewer, cid)
+            for interviewer, user_feedback in feedback.items()
+            for cid, entry in user_feedback.items()
+            if entry.get("submitted", False)
+        )
+    )
+    index = {
+        "keys": [],
+        "by_candidate": {},
+        "by_interviewer": {},
+        "by_rating": {},
+        "dates": [],
+        "date_rows": [],
+    }
+    dated = []
+    for row_id, (_, interviewer, cid) in enumerate(submitted):
+        entry = feedback[interviewer][cid]
+        index["keys"].append((interviewer, cid))
+        index["by_candidate"].setdefault(cid, []).append(row_id)
+        index["by_interviewer"].setdefault(interviewer, []).append(row_id)
+        index["by_rating"].setdefault(entry.get("overall_rating", ""), []).append(
+            row_id
+        )
+        try:
+            dated.append((datetime.fromisoformat(entry.get("timestamp", "")), row_id))
+        except (TypeError, ValueError):
+            pass
+    dated.sort()
+    index["dates"] = [d for d, _ in dated]
+    index["date_rows"] = [row_id for _, row_id in dated]
+    return index
+
+
+def get_feedback_index(feedback, rubric, feedback_version):
+    """
+    Return build_feedback_index() results, cached in session_state by feedback and rubric version.
+    """
+    key = (feedback_version, rubric.version)
+    cached = st.session_state.get("_cached_feedback_index")
+    if cached and cached[0] == key:
+        return cached[1]
+    index = build_feedback_index(feedback, rubric)
+    st.session_state["_cached_feedback_index"] = (key, index)
+    return index
+
+
+def query_feedback_index(
+    index, candidate_ids=(), interviewers=(), ratings=(), date_range=None
+):
+    """
+    Return the sorted row ids matching every given filter. Values within a filter
+    are alternatives; date_range is an inclusive (start, end) datetime pair.
+    """
+    selected = None
+    for lookup, wanted in (
+        (index["by_candidate"], candidate_ids),
+        (index["by_interviewer"], interviewers),
+        (index["by_rating"], ratings),
+    ):
+        if not wanted:
+            continue
+        rows = set()
+        for value in wanted:
+            rows.update(lookup.get(value, ()))
+        selected = rows if selected is None else selected & rows
+    if date_range is not None:
+        start, end = date_range
+        lo = bisect_left(index["dates"], start)
+        hi = bisect_right(index["dates"], end)
+        rows = set(index["date_rows"][lo:hi])
+        selected = rows if selected is None else selected & rows
+    if selected is None:
+        return list(range(len(index["keys"])))
+    return sorted(selected)
+
+
+def _date_filter(index):
+    """
+    Show the date range picker; return a datetime range, or None if it covers
+    every dated entry (so undated entries are not filtered out).
+    """
+    if not index["dates"]:
+        return None
+    first, last = index["dates"][0].date(), index["dates"][-1].date()
+    picked = st.date_input(
+        "Last modified between", value=(first, last), key="explorer_dates"
+    )
+    if not isinstance(picked, (list, tuple)):
+        picked = (picked,)
+    if not picked or (picked[0] <= first and picked[-1] >= last):
+        return None
+    return datetime.combine(picked[0], time.min), datetime.combine(picked[-1], time.max)
+
+
+def show_feedback_explorer(feedback, index, rubric, scores):
+    """
+    Display filters over submitted feedback and one page of matching entries.
+    index: from get_feedback_index().
+    """
+    st.header("Feedback Explorer", anchor=None)
+    if not index["keys"]:
+        st.info("No feedback has been submitted yet.")
+        return
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        candidate_ids = st.multiselect(
+            "Candidate",
+            list(dict.fromkeys(cid for _, cid in index["keys"])),
+            format_func=lambda cid: rubric.candidates.get(cid, f"Unknown_{cid}"),
+            key="explorer_candidates",
+        )
+    with col2:
+        interviewers = st.multiselect(
+            "Interviewer", sorted(index["by_interviewer"]), key="explorer_interviewers"
+        )
+    with col3:
+        ratings = st.multiselect(
+            "Overall rating",
+            [r for r in rubric.rating_options if r in index["by_rating"]]
+            + sorted(r for r in index["by_rating"] if r not in rubric.rating_options),
+            key="explorer_ratings",
+        )
+    with col4:
+        date_range = _date_filter(index)
+    row_ids = query_feedback_index(
+        index, candidate_ids, interviewers, ratings, date_range
+    )
+
+    col1, col2, _ = st.columns([1, 1, 2])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key="explorer_page_size")
+    n_pages = max(1, math.ceil(len(row_ids) / page_size))
+    # Filters may shrink the result below the page the admin was on
+    if st.session_state.get("explorer_page", 1) > n_pages:
+        st.session_state["explorer_page"] = n_pages
+    with col2:
+        page = st.number_input(
+            "Page", min_value=1, max_value=n_pages, step=1, key="explorer_page"
+        )
+    page_rows = row_ids[(page - 1) * page_size : page * page_size]
+    page_df = build_feedback_df(
+        feedback, [index["keys"][i] for i in page_rows], rubric, scores
+    )
+    st.caption(
+        f"{len(row_ids)} matching entries, page {page} of {n_pages}. Double-click a Notes cell to view all the text if it is truncated."
+    )
+    st.dataframe(page_df, use_container_width=True, hide_index=True)
+
+
+def notes_snippet(text, query, width=SNIPPET_CHARS):
+    """Return up to width characters of text around the first query word found."""
+    lowered = text.casefold()
+    positions = [lowered.find(word) for word in tokenize(query)]
+    positions = [pos for pos in positions if pos >= 0]
+    start = max(0, min(positions, default=0) - width // 4)
+    snippet = text[start : start + width]
+    if start > 0:
+        snippet = "…" + snippet
+    if start + width < len(text):
+        snippet += "…"
+    return snippet
+
+
+def show_notes_search(rubric):
+    """
+    Display a search box over submitted overall and criteria notes, with ranked hits.
+    """
+    st.header("Search Notes", anchor=None)
+    query = st.text_input(
+        "Search notes",
+        key="notes_search_query",
+        placeholder="e.g. Qualtrics recruitment",
+        label_visibility="collapsed",
+    )
+    if not query.strip():
+        st.caption(
+            "Finds words in submitted overall and criteria notes. Words match as prefixes, so 'recruit' also finds 'recruitment'."
+        )
+        return
+    if not has_search_index():
+        st.info("Notes search will be available once Google Sheets is reachable.")
+        return
+    hits = search_notes(query)
+    if not hits:
+        st.info("No notes match that search.")
+        return
+    st.caption(f"Top {len(hits)} matching notes, best first.")
+    hits_df = pd.DataFrame(
+        [
+            {
+                "Candidate_Name": rubric.candidates.get(cid, f"Unknown_{cid}"),
+                "Interviewer": interviewer,
+                "Field": (
+                    "Overall notes" if field == OVERALL_FIELD else f"{field} notes"
+                ),
+                "Score": round(score, 2),
+                "Notes": notes_snippet(text, query),
+            }
+            for score, interviewer, cid, field, text in hits
+        ]
+    )
+    st.dataframe(hits_df, use_container_width=True, hide_index=True)
@@ -1,10 +1,52 @@
 # Google Sheets integration
+import copy
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
 import streamlit as st
 import gspread
+from google.auth.exceptions import TransportError
 from google.oauth2.service_account import Credentials
-import time
 from gspread.exceptions import APIError
-from configuration import WORKSHEET_NAME, SHEET_KEY
+from requests.exceptions import RequestException
+from configuration import (
+    APP_EXPIRATION_DATE,
+    WORKSHEET_NAME,
+    SHEET_KEY,
+    SHEETS_FAILURE_THRESHOLD,
+    SHEETS_COOLDOWN_SECONDS,
+)
+from rubric import BASE_HEADERS, column_letter, get_rubric
+from aggregates import record_entry, rebuild_aggregates
+from archive import load_archived_records, select_rows_to_archive, write_archive
+from notes_search import index_entry_notes
+
+logger = logging.getLogger(__name__)
+
+# Columns A:D, enough to decide which rows a panelist may load
+KEY_HEADERS = BASE_HEADERS[:4]
+
+
+class StorageUnavailable(Exception):
+    """Google Sheets is failing, or the circuit breaker is open."""
+
+
+# Process-wide circuit breaker state, the last good copy of every entry seen
+# (served while Sheets is down), writes held until it is back, and held writes
+# the sheet rejected. All guarded by _lock. Writes of one entry are serialized by
+# its lock in _entry_locks, so a save and the background flush never race.
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_migrate_lock = threading.Lock()
+_breaker = {"state": "closed", "failures": 0, "opened_at": 0.0}
+_snapshot = {"entries": {}, "updated_at": ""}
+_pending_writes = {}
+_failed_writes = []
+_flusher = {"thread": None}
+_entry_locks = {}
 
 
 def get_feedback_status(feedback_entry):
@@ -29,7 +71,43 @@ def get_feedback_status(feedback_entry):
     return "not_started"
 
 
-def get_gsheet(max_retries=5, delay=2):
+def get_feedback_version():
+    """
+    Return a counter that changes whenever this session's feedback is loaded or saved.
+    Used as a cache key for values derived from the feedback dict.
+    """
+    return st.session_state.get("_feedback_version", 0)
+
+
+def bump_feedback_version():
+    st.session_state["_feedback_version"] = get_feedback_version() + 1
+
+
+def feedback_read_at():
+    """
+    Return time.monotonic() when this session's feedback was read from the
+    sheet, for rebuilds from it to replay the saves made since.
+    """
+    return st.session_state.get("_cached_feedback_read_at", 0.0)
+
+
+def refresh_aggregates(feedback, rubric, since=None):
+    """
+    Rebuild the admin dashboard aggregates from a full feedback dict.
+    since: see feedback_read_at().
+    """
+    return rebuild_aggregates(
+        (
+            (user, candidate_id, entry, get_feedback_status(entry))
+            for user, user_feedback in feedback.items()
+            for candidate_id, entry in user_feedback.items()
+        ),
+        rubric,
+        since,
+    )
+
+
+def get_gsheet():
     scopes = [
         "https://www.googleapis.com/auth/spreadsheets",
         "https://www.googleapis.com/auth/drive",
@@ -38,97 +116,377 @@ def get_gsheet(max_retries=5, delay=2):
         st.secrets["gcp_service_account"], scopes=scopes
     )
     gc = gspread.authorize(creds)
-    for attempt in range(max_retries):
-        try:
-            sh = gc.open_by_key(SHEET_KEY)
-            # sh = gc.open(SHEET_NAME)
-            worksheet = sh.worksheet(WORKSHEET_NAME)
-            return worksheet
-        except APIError as e:
-            # Exponential backoff for 500/503 errors
-            if hasattr(e, "response") and getattr(e.response, "status_code", None) in [
-                500,
-                503,
-            ]:
-                if attempt < max_retries - 1:
-                    time.sleep(delay * (2**attempt))
-                    continue
-            raise
-
-
-def load_feedback():
-    # Only load from Google Sheets if not already cached in session_state
-    if "_cached_feedback" in st.session_state:
-        return st.session_state["_cached_feedback"]
-    worksheet = get_gsheet()
-    expected_headers = [
-        "Interviewer",
-        "Candidate_ID",
-        "Candidate_Name",
-        "Submitted",
-        "Overall_Rating",
-        "Overall_Notes",
-        "Timestamp",
+    sh = gc.open_by_key(SHEET_KEY)
+    # sh = gc.open(SHEET_NAME)
+    return sh.worksheet(WORKSHEET_NAME)
+
+
+def _is_outage(error):
+    """True for errors that mean Sheets is down or overloaded, not a bad request."""
+    if isinstance(error, APIError):
+        status = getattr(getattr(error, "response", None), "status_code", None) or 0
+        return status == 429 or status >= 500
+    return isinstance(error, (RequestException, TransportError))
+
+
+def _allow_call():
+    """
+    Raise StorageUnavailable while the breaker is open. Once the cooldown has
+    passed, let one call through as the probe (half-open); if that probe never
+    reports back, another is allowed after a further cooldown.
+    """
+    with _lock:
+        if _breaker["state"] == "closed":
+            return
+        now = time.monotonic()
+        if now - _breaker["opened_at"] >= SHEETS_COOLDOWN_SECONDS:
+            _breaker.update(state="half_open", opened_at=now)
+            return
+    raise StorageUnavailable("Google Sheets is unavailable; serving cached feedback")
+
+
+def _record_call(ok):
+    with _lock:
+        if ok:
+            if _breaker["state"] != "closed":
+                logger.warning("Google Sheets is reachable again; closing the breaker")
+            _breaker.update(state="closed", failures=0)
+            return
+        _breaker["failures"] += 1
+        if (
+            _breaker["state"] == "half_open"
+            or _breaker["failures"] >= SHEETS_FAILURE_THRESHOLD
+        ):
+            if _breaker["state"] == "closed":
+                logger.warning("Google Sheets is failing; opening the breaker")
+            _breaker.update(state="open", opened_at=time.monotonic())
+
+
+@contextmanager
+def _sheets_call():
+    """
+    Run a block of Sheets calls through the circuit breaker. Outage errors are
+    counted and re-raised as StorageUnavailable; after a success, held writes
+    are flushed in the background.
+    """
+    _allow_call()
+    try:
+        yield
+    except StorageUnavailable:
+        raise
+    except Exception as e:
+        # Any other error still means Sheets answered
+        _record_call(not _is_outage(e))
+        if _is_outage(e):
+            raise StorageUnavailable(str(e)) from e
+        raise
+    _record_call(True)
+    _start_flush()
+
+
+def check_storage():
+    """
+    Probe Sheets if the breaker is open and its cooldown has passed.
+    Returns True if storage is available.
+    """
+    if _breaker["state"] == "closed":
+        return True
+    try:
+        with _sheets_call():
+            get_gsheet()
+    except StorageUnavailable:
+        pass
+    return _breaker["state"] == "closed"
+
+
+def storage_read_only():
+    """
+    True while the breaker is open, or this session's feedback was served from
+    the cached snapshot; the UI then disables editing.
+    """
+    return _breaker["state"] != "closed" or st.session_state.get(
+        "_cached_feedback_degraded", False
+    )
+
+
+def snapshot_time():
+    """ISO time the cached snapshot was last updated, or "" if there is none."""
+    return _snapshot["updated_at"]
+
+
+def _remember(feedback, replace=False):
+    """Copy entries into the snapshot; replace=True for a full read of the sheet."""
+    entries = {
+        (user, cid): copy.deepcopy(entry)
+        for user, user_feedback in feedback.items()
+        for cid, entry in user_feedback.items()
+    }
+    with _lock:
+        if replace:
+            # Held writes are newer than anything read from the sheet
+            for key, fb in _pending_writes.items():
+                entries[key] = copy.deepcopy(fb)
+            _snapshot["entries"] = entries
+        else:
+            _snapshot["entries"].update(entries)
+        _snapshot["updated_at"] = datetime.now().isoformat()
+
+
+def _snapshot_feedback(username=None, candidate_id=None):
+    """
+    Build a feedback dict from the snapshot, limited to what username may see
+    (see _visible_row_indexes); None returns everything.
+    """
+    with _lock:
+        items = list(_snapshot["entries"].items())
+    if username is not None:
+        keys = [
+            (user, cid, entry.get("submitted", False)) for (user, cid), entry in items
+        ]
+        items = [items[i] for i in _visible_row_indexes(keys, username, candidate_id)]
+    feedback = {}
+    for (user, cid), entry in items:
+        feedback.setdefault(user, {})[cid] = copy.deepcopy(entry)
+    return feedback
+
+
+def _merge_feedback(feedback, extra):
+    """Merge extra's entries into feedback, extra taking precedence."""
+    for user, entries in extra.items():
+        feedback.setdefault(user, {}).update(entries)
+    return feedback
+
+
+def _column_layout(columns):
+    """
+    Resolve the sheet layout once from its header: where each base column sits
+    and which criterion each CriteriaRating_/CriteriaNotes_ column belongs to.
+    """
+    layout = {"base": {}, "ratings": {}, "notes": {}}
+    for idx, name in enumerate(columns):
+        name = str(name)
+        if name in BASE_HEADERS:
+            layout["base"].setdefault(name, idx)
+        elif name.startswith("CriteriaRating_"):
+            layout["ratings"][name[len("CriteriaRating_") :]] = idx
+        elif name.startswith("CriteriaNotes_"):
+            layout["notes"][name[len("CriteriaNotes_") :]] = idx
+    return layout
+
+
+def _cell(row, idx):
+    """Return a row's cell as a string; short rows omit trailing empty cells."""
+    if idx is None or idx >= len(row) or row[idx] is None:
+        return ""
+    return str(row[idx])
+
+
+def _row_keys(rows, layout):
+    """Return (interviewer, candidate_id, submitted) for every row."""
+    base = layout["base"]
+    user_idx = base.get("Interviewer")
+    cid_idx = base.get("Candidate_ID")
+    submitted_idx = base.get("Submitted")
+    return [
+        (
+            _cell(row, user_idx),
+            _cell(row, cid_idx),
+            _cell(row, submitted_idx).lower() == "true",
+        )
+        for row in rows
     ]
-    records = worksheet.get_all_records(expected_headers=expected_headers)
+
+
+def _values_to_feedback(header, rows):
+    """
+    Build the nested {interviewer: {candidate_id: entry}} dict from raw sheet rows,
+    using column positions resolved once from the header. Later rows win on
+    duplicate keys.
+    """
+    layout = _column_layout(header)
+    base = layout["base"]
+    name_idx = base.get("Candidate_Name")
+    rating_idx = base.get("Overall_Rating")
+    notes_idx = base.get("Overall_Notes")
+    timestamp_idx = base.get("Timestamp")
+    criteria_ratings = list(layout["ratings"].items())
+    criteria_notes = list(layout["notes"].items())
     feedback = {}
-    for row in records:
-        user = row.get("Interviewer", "")
-        candidate_id = str(row.get("Candidate_ID", ""))
+    for row, (user, candidate_id, submitted) in zip(rows, _row_keys(rows, layout)):
         if not user or not candidate_id:
             continue
-        if user not in feedback:
-            feedback[user] = {}
-        criteria_ratings = {}
-        criteria_notes = {}
-        for key, value in row.items():
-            if key.startswith("CriteriaRating_"):
-                crit = key.replace("CriteriaRating_", "")
-                criteria_ratings[crit] = value
-            elif key.startswith("CriteriaNotes_"):
-                crit = key.replace("CriteriaNotes_", "")
-                criteria_notes[crit] = value
-        submitted_val = row.get("Submitted", False)
-        if isinstance(submitted_val, str):
-            submitted = submitted_val.lower() == "true"
-        else:
-            submitted = bool(submitted_val)
-        feedback[user][candidate_id] = {
-            "candidate_name": row.get("Candidate_Name", ""),
-            "overall_rating": row.get("Overall_Rating", ""),
-            "overall_notes": row.get("Overall_Notes", ""),
+        feedback.setdefault(user, {})[candidate_id] = {
+            "candidate_name": _cell(row, name_idx),
+            "overall_rating": _cell(row, rating_idx),
+            "overall_notes": _cell(row, notes_idx),
             "submitted": submitted,
-            "timestamp": row.get("Timestamp", ""),
-            "criteria_ratings": criteria_ratings,
-            "criteria_notes": criteria_notes,
+            "timestamp": _cell(row, timestamp_idx),
+            "criteria_ratings": {c: _cell(row, i) for c, i in criteria_ratings},
+            "criteria_notes": {c: _cell(row, i) for c, i in criteria_notes},
         }
+    return feedback
+
+
+def _records_to_feedback(records):
+    """
+    Build the feedback dict from header -> value records (the archive's format).
+    """
+    header = list(dict.fromkeys(key for record in records for key in record))
+    return _values_to_feedback(
+        header, [[record.get(key, "") for key in header] for record in records]
+    )
+
+
+def _visible_row_indexes(keys, username, candidate_id=None):
+    """
+    Select the rows a panelist may hold: their own entries, plus other panelists'
+    submitted entries for candidates they have submitted themselves.
+    keys: list of (interviewer, candidate_id, submitted) per row.
+    candidate_id: only return other panelists' submitted rows for this candidate
+    (used when the panelist has just unlocked it).
+    """
+    own = []
+    unlocked = set()
+    others_submitted = {}
+    for idx, (user, cid, submitted) in enumerate(keys):
+        if not user or not cid:
+            continue
+        if user == username:
+            own.append(idx)
+            if submitted:
+                unlocked.add(cid)
+        elif submitted:
+            others_submitted.setdefault(cid, []).append(idx)
+    if candidate_id is not None:
+        return others_submitted.get(candidate_id, [])
+    visible = own
+    for cid in unlocked:
+        visible += others_submitted.get(cid, [])
+    return sorted(visible)
+
+
+def _row_runs(row_numbers):
+    """Collapse sorted sheet row numbers into (first, last) runs of consecutive rows."""
+    runs = []
+    for row_number in row_numbers:
+        if runs and row_number == runs[-1][1] + 1:
+            runs[-1][1] = row_number
+        else:
+            runs.append([row_number, row_number])
+    return runs
+
+
+def _row_ranges(row_numbers, last_column):
+    """Collapse sorted sheet row numbers into as few A1 ranges as possible."""
+    return [f"A{first}:{last_column}{last}" for first, last in _row_runs(row_numbers)]
+
+
+def _filter_visible(header, rows, username, candidate_id=None):
+    keys = _row_keys(rows, _column_layout(header))
+    return [rows[i] for i in _visible_row_indexes(keys, username, candidate_id)]
+
+
+def _load_visible_values(worksheet, username, candidate_id=None):
+    """
+    Fetch only the rows visible to username: first the header and key columns,
+    then just the selected rows. Returns (header, rows) of raw values.
+    """
+    key_columns = f"A2:{column_letter(len(KEY_HEADERS))}"
+    header_range, key_range = worksheet.batch_get(["1:1", key_columns])
+    header = header_range[0] if header_range else []
+    if header[: len(KEY_HEADERS)] != KEY_HEADERS:
+        # Unexpected layout: read everything, but keep only what the user may see
+        values = worksheet.get_all_values()
+        header, rows = (values[0], values[1:]) if values else ([], [])
+        return header, _filter_visible(header, rows, username, candidate_id)
+    keys = _row_keys(key_range, _column_layout(KEY_HEADERS))
+    visible = _visible_row_indexes(keys, username, candidate_id)
+    if not visible:
+        return header, []
+    # Key rows start at sheet row 2
+    row_numbers = [i + 2 for i in visible]
+    rows = []
+    last_column = column_letter(len(header))
+    for value_range in worksheet.batch_get(_row_ranges(row_numbers, last_column)):
+        rows.extend(value_range)
+    # Rows may have moved since the keys were read (compaction deletes rows).
+    # Only keep the result if every fetched row is the one that was selected.
+    if _row_keys(rows, _column_layout(header)) != [keys[i] for i in visible]:
+        values = worksheet.get_all_values()
+        header, rows = (values[0], values[1:]) if values else ([], [])
+        return header, _filter_visible(header, rows, username, candidate_id)
+    return header, rows
+
+
+def load_feedback(username=None):
+    """
+    Load feedback from the sheet, cached in session_state.
+    username: load only what this panelist may see; None loads everything (admins).
+    While Sheets is unavailable, serves the process-wide snapshot instead and
+    retries once the breaker closes.
+    """
+    # Only load from Google Sheets if not already cached for this user
+    if (
+        "_cached_feedback" in st.session_state
+        and st.session_state.get("_cached_feedback_scope") == username
+        and not (
+            st.session_state.get("_cached_feedback_degraded")
+            and _breaker["state"] == "closed"
+        )
+    ):
+        return st.session_state["_cached_feedback"]
+    degraded = False
+    read_at = time.monotonic()
+    try:
+        with _sheets_call():
+            worksheet = get_gsheet()
+            if username is None:
+                values = worksheet.get_all_values()
+                header, rows = (values[0], values[1:]) if values else ([], [])
+            else:
+                header, rows = _load_visible_values(worksheet, username)
+        feedback = _values_to_feedback(header, rows)
+        _remember(feedback, replace=username is None)
+    except StorageUnavailable as e:
+        logger.warning("Serving cached feedback: %s", e)
+        feedback = _snapshot_feedback(username)
+        degraded = True
+    if username is None:
+        # Archived entries first, so a live entry for the same key takes precedence
+        feedback = _merge_feedback(
+            _records_to_feedback(load_archived_records()), feedback
+        )
     st.session_state["_cached_feedback"] = feedback
+    st.session_state["_cached_feedback_scope"] = username
+    st.session_state["_cached_feedback_degraded"] = degraded
+    st.session_state["_cached_feedback_read_at"] = read_at
+    bump_feedback_version()
     return feedback
 
 
-def save_feedback(feedback, user=None, candidate_id=None, criteria_list=None):
+def load_unlocked_feedback(feedback, username, candidate_id):
     """
-    Save or update feedback for a single user/candidate pair, including all criteria ratings/notes.
-    criteria_list: list of criteria names (strings) to save ratings/notes for.
+    Fetch other panelists' submitted entries for a candidate the user has just
+    submitted, and merge them into feedback.
     """
-    # Always write feedback to Google Sheets, even if not submitted
-    if user is None or candidate_id is None or criteria_list is None:
-        return
-    fb = feedback.get(user, {}).get(candidate_id, {})
-    worksheet = get_gsheet()
-    headers = [
-        "Interviewer",
-        "Candidate_ID",
-        "Candidate_Name",
-        "Submitted",
-        "Overall_Rating",
-        "Overall_Notes",
-        "Timestamp",
-    ]
-    for crit in criteria_list:
-        headers.append(f"CriteriaRating_{crit}")
-    for crit in criteria_list:
-        headers.append(f"CriteriaNotes_{crit}")
+    try:
+        with _sheets_call():
+            worksheet = get_gsheet()
+            header, rows = _load_visible_values(worksheet, username, candidate_id)
+        unlocked = _values_to_feedback(header, rows)
+        _remember(unlocked)
+    except StorageUnavailable:
+        unlocked = _snapshot_feedback(username, candidate_id)
+        st.session_state["_cached_feedback_degraded"] = True
+    _merge_feedback(feedback, unlocked)
+    bump_feedback_version()
+    return feedback
+
+
+def _write_entry(worksheet, user, candidate_id, fb, rubric):
+    """Write one entry's row, updating it in place if it exists or appending it."""
+    headers = rubric.sheet_headers
+    criteria_list = rubric.criteria_list
     row = [
         user,
         candidate_id,
@@ -146,19 +504,189 @@ def save_feedback(feedback, user=None, candidate_id=None, criteria_list=None):
     sheet_values = worksheet.get_all_values()
     if not sheet_values:
         worksheet.insert_row(headers, 1)
-    elif sheet_values[0] != headers:
-        worksheet.update(f"A1:{chr(65+len(headers)-1)}1", [headers])
-    # Find if this user/candidate_id already exists in the sheet
-    records = worksheet.get_all_records(expected_headers=headers)
-    found = False
-    for idx, record in enumerate(records, start=2):
-        if record.get("Interviewer") == user and str(record.get("Candidate_ID")) == str(
-            candidate_id
-        ):
-            worksheet.update(f"A{idx}:{chr(65+len(headers)-1)}{idx}", [row])
-            found = True
-            break
-    if not found:
+    elif sheet_values[0][: len(headers)] != headers:
+        sheet_values = _migrate_columns(worksheet, headers)
+    # Find if this user/candidate_id already exists in the sheet. Rows never
+    # move while the app is live: compaction clears archived rows instead of
+    # deleting them (see compact_feedback).
+    idx = _find_row(sheet_values[1:], [str(user), str(candidate_id)])
+    if idx is None:
         worksheet.append_row(row)
+    else:
+        worksheet.update(f"A{idx}:{rubric.last_column}{idx}", [row])
+
+
+def _migrate_columns(worksheet, headers):
+    """
+    Rewrite the sheet so its columns follow headers (the rubric changed), moving
+    each column's data by name. Columns the rubric no longer has are kept after
+    them, so no notes are lost or read under another criterion.
+    Returns the sheet's values after the migration.
+    """
+    with _migrate_lock:
+        # Re-read under the lock: sessions that saw the old header wait here,
+        # and must not rewrite the sheet from a read older than the migration
+        # (and the saves) of the session that went first
+        values = worksheet.get_all_values()
+        if values[0][: len(headers)] == headers:
+            return values
+        old_header = values[0]
+        positions = {}
+        for idx, name in enumerate(old_header):
+            if name:
+                positions.setdefault(name, idx)
+        new_header = list(headers) + [name for name in positions if name not in headers]
+        width = max(len(old_header), len(new_header))
+        new_values = [new_header + [""] * (width - len(new_header))]
+        for row in values[1:]:
+            new_row = [_cell(row, positions.get(name)) for name in new_header]
+            new_values.append(new_row + [""] * (width - len(new_row)))
+        logger.warning("Rubric columns changed; moving sheet columns to %s", headers)
+        worksheet.update(f"A1:{column_letter(width)}{len(new_values)}", new_values)
+        return new_values
+
+
+def _find_row(rows, key):
+    """Return the sheet row number of the row whose first two cells match key."""
+    for idx, row in enumerate(rows, start=2):
+        if [_cell(row, 0), _cell(row, 1)] == key:
+            return idx
+    return None
+
+
+def _entry_lock(key):
+    """Return the lock held while writing the (user, candidate_id) entry's row."""
+    with _lock:
+        return _entry_locks.setdefault(key, threading.Lock())
+
+
+def _start_flush():
+    """
+    Flush held writes on a background thread, so no session's rerun waits for
+    them. At most one flush runs at a time.
+    """
+    if not _pending_writes or not _flush_lock.acquire(blocking=False):
+        return
+    thread = threading.Thread(
+        target=_flush_pending_writes, name="flush-held-feedback", daemon=True
+    )
+    _flusher["thread"] = thread
+    thread.start()
+
+
+def _flush_pending_writes():
+    """
+    Write held entries to the sheet, oldest first, with the current rubric.
+    Stops at an outage and keeps the rest held. An entry the sheet rejects for
+    any other reason is logged and moved to _failed_writes, so it cannot block
+    the queue. Runs with _flush_lock held (see _start_flush).
+    """
+    try:
+        while True:
+            with _lock:
+                if not _pending_writes or _breaker["state"] != "closed":
+                    return
+                key, fb = next(iter(_pending_writes.items()))
+            with _entry_lock(key):
+                with _lock:
+                    # A save of the same entry may have written or re-held it
+                    # while this thread waited for the lock
+                    if _pending_writes.get(key) is not fb:
+                        continue
+                try:
+                    with _sheets_call():
+                        _write_entry(get_gsheet(), key[0], key[1], fb, get_rubric())
+                except StorageUnavailable:
+                    return
+                except Exception:
+                    logger.exception("Dropping held feedback for %s/%s", *key)
+                    with _lock:
+                        _failed_writes.append((key, fb))
+                with _lock:
+                    if _pending_writes.get(key) is fb:
+                        del _pending_writes[key]
+    finally:
+        _flush_lock.release()
+
+
+def pending_write_count():
+    return len(_pending_writes)
+
+
+def failed_write_count():
+    return len(_failed_writes)
+
+
+def save_feedback(feedback, user=None, candidate_id=None, rubric=None):
+    """
+    Save or update feedback for a single user/candidate pair, including all criteria ratings/notes.
+    rubric: the compiled Rubric whose criteria and sheet headers are written.
+    While Sheets is unavailable the entry is held and written once it is back.
+    """
+    # Always write feedback to Google Sheets, even if not submitted
+    if user is None or candidate_id is None or rubric is None:
+        return
+    fb = feedback.get(user, {}).get(candidate_id, {})
+    key = (user, candidate_id)
+    # Waits for a flush of this entry's held copy that is already writing
+    with _entry_lock(key):
+        with _lock:
+            # This write supersedes any held copy of the same entry
+            _pending_writes.pop(key, None)
+        try:
+            with _sheets_call():
+                _write_entry(get_gsheet(), user, candidate_id, fb, rubric)
+        except StorageUnavailable as e:
+            logger.warning("Holding feedback for %s/%s: %s", user, candidate_id, e)
+            with _lock:
+                _pending_writes[key] = copy.deepcopy(fb)
+    _remember({user: {candidate_id: fb}})
+    record_entry(user, candidate_id, fb, get_feedback_status(fb), rubric)
+    index_entry_notes(user, candidate_id, fb)
     # Update cache
     st.session_state["_cached_feedback"] = feedback
+    bump_feedback_version()
+
+
+def compact_feedback(candidate_ids=None, before=None, archive_all=False, dry_run=False):
+    """
+    Move rows for closed candidates, candidates whose rows were all last modified
+    before `before`, or every row if archive_all, from the live sheet to the
+    local archive. Until APP_EXPIRATION_DATE the archived rows are cleared, not
+    deleted, so the row numbers running sessions read and write by never shift.
+    Returns the number of rows archived (or that would be, with dry_run).
+    """
+    with _sheets_call():
+        worksheet = get_gsheet()
+        values = worksheet.get_all_values()
+    if len(values) < 2:
+        return 0
+    header = values[0]
+    rows = [row + [""] * (len(header) - len(row)) for row in values[1:]]
+    records = [dict(zip(header, row)) for row in rows]
+    selected = select_rows_to_archive(records, candidate_ids, before, archive_all)
+    if dry_run or not selected:
+        return len(selected)
+    write_archive(
+        [records[i] for i in selected],
+        reason=f"candidates={sorted(candidate_ids or [])} before={before} all={archive_all}",
+    )
+    # Panelists may have saved since the read; only remove rows that are unchanged.
+    # A changed row stays live, and the live copy wins over the archived one.
+    with _sheets_call():
+        current = worksheet.get_all_values()
+        row_numbers = []
+        for i in selected:
+            current_row = current[i + 1] if i + 1 < len(current) else []
+            if current_row + [""] * (len(header) - len(current_row)) == rows[i]:
+                row_numbers.append(i + 2)
+        runs = _row_runs(row_numbers)
+        if datetime.now() > APP_EXPIRATION_DATE:
+            # No sessions are running: delete from the bottom up so earlier row
+            # numbers stay valid
+            for first, last in reversed(runs):
+                worksheet.delete_rows(first, last)
+        elif runs:
+            # Loads skip rows without an interviewer and candidate
+            worksheet.batch_clear(_row_ranges(row_numbers, column_letter(len(header))))
+    return len(row_numbers)
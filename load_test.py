@@ -0,0 +1,440 @@
+"""
+Headless load test for app.py using Streamlit's AppTest.
+
+Drives scripted panelist and admin sessions against an in-memory fake worksheet
+with configurable latency, and reports rerun latency percentiles, storage calls per
+session and peak memory.
+
+AppTest swaps process-global Streamlit state on every run, so sessions are spread
+over worker processes; each worker runs its sessions one after another against its
+own copy of the fake sheet. The numbers are therefore per-session costs with no
+concurrent sessions sharing a process, its caches or the sheet: they are not the
+capacity of one app instance, where all sessions share one process and one GIL.
+The app expiration check is disabled for the test.
+A simulated outage window makes every storage call fail, to exercise the circuit
+breaker and read-only mode.
+
+Usage:
+    python load_test.py --panelists 20 --admins 2 --workers 4 --latency-ms 150
+    python load_test.py --outage-start-s 5 --outage-s 20 --cooldown-s 5
+"""
+
+import argparse
+import random
+import re
+import resource
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+APP_PATH = str(Path(__file__).with_name("app.py"))
+PASSWORD = "load-test-password"
+ADMIN_USERNAME = "admin"
+WORDS = "research participants recruitment qualtrics synthesis stakeholders".split()
+
+
+class FakeWorksheet:
+    """
+    In-memory stand-in for a gspread worksheet. Every call sleeps for the
+    configured latency and is counted. During the outage window, given as
+    (start, end) seconds after creation, calls fail with a connection error.
+    """
+
+    def __init__(self, values, latency, outage=None):
+        self.values = values
+        self.latency = latency
+        self.outage = outage
+        self.created = time.monotonic()
+        self.calls = 0
+        self.failed_calls = 0
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.outage:
+            elapsed = time.monotonic() - self.created
+            if self.outage[0] <= elapsed < self.outage[1]:
+                self.failed_calls += 1
+                raise RequestsConnectionError("simulated Sheets outage")
+
+    def get_all_values(self):
+        self._call()
+        return [list(row) for row in self.values]
+
+    def batch_get(self, ranges):
+        self._call()
+        return [self._get_range(range_name) for range_name in ranges]
+
+    def _get_range(self, range_name):
+        """Resolve A1 ranges of the forms "1:1", "A2:D" and "A5:Q7"."""
+        match = re.fullmatch(r"([A-Z]*)(\d*):([A-Z]*)(\d*)", range_name)
+        first_col, first_row, last_col, last_row = match.groups()
+        start = int(first_row or 1) - 1
+        end = int(last_row) if last_row else len(self.values)
+        col_start = column_index(first_col) - 1 if first_col else 0
+        col_end = column_index(last_col) if last_col else None
+        return [list(row[col_start:col_end]) for row in self.values[start:end]]
+
+    def get_all_records(self, expected_headers=None):
+        self._call()
+        if not self.values:
+            return []
+        headers = self.values[0]
+        return [
+            dict(zip(headers, row + [""] * (len(headers) - len(row))))
+            for row in self.values[1:]
+        ]
+
+    def insert_row(self, row, index=1):
+        self._call()
+        self.values.insert(index - 1, [str(x) for x in row])
+
+    def append_row(self, row):
+        self._call()
+        self.values.append([str(x) for x in row])
+
+    def batch_clear(self, ranges):
+        self._call()
+        for range_name in ranges:
+            first, last = range_name.split(":")
+            for row_idx in range(
+                int("".join(ch for ch in first if ch.isdigit())),
+                int("".join(ch for ch in last if ch.isdigit())) + 1,
+            ):
+                self.values[row_idx - 1] = []
+
+    def delete_rows(self, start_index, end_index=None):
+        self._call()
+        del self.values[start_index - 1 : end_index or start_index]
+
+    def update(self, range_name, rows):
+        """Write rows starting at the range's first row (column A ranges only)."""
+        self._call()
+        start = range_name.split(":")[0]
+        row_idx = int("".join(ch for ch in start if ch.isdigit()))
+        while len(self.values) < row_idx + len(rows) - 1:
+            self.values.append([])
+        for offset, row in enumerate(rows):
+            self.values[row_idx - 1 + offset] = [str(x) for x in row]
+
+
+def column_index(letters):
+    """Return the 1-based column number for A1-notation column letters."""
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def random_notes(rng, chars):
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def seed_sheet_values(seed_rows, notes_chars, rng):
+    """Build a sheet with past feedback rows so reads cost what a full sheet costs."""
+    from rubric import get_rubric
+
+    rubric = get_rubric()
+    criteria_list = rubric.criteria_list
+    ratings = rubric.rating_options
+    values = [list(rubric.sheet_headers)]
+    for i in range(seed_rows):
+        row = [
+            f"past_panelist_{i % 25}",
+            str(100 + i // 25),
+            f"Past candidate {i // 25}",
+            "TRUE",
+            rng.choice(ratings),
+            random_notes(rng, notes_chars),
+            datetime.now().isoformat(),
+        ]
+        row += [rng.choice(ratings) for _ in criteria_list]
+        row += [random_notes(rng, notes_chars) for _ in criteria_list]
+        values.append(row)
+    return values
+
+
+def build_secrets(panelists):
+    usernames = [ADMIN_USERNAME] + panelists
+    return {
+        "COOKIE_KEY": "load-test-cookie-key",
+        "credentials": {
+            "usernames": usernames,
+            "names": usernames,
+            "passwords": [PASSWORD] * len(usernames),
+        },
+        "gcp_service_account": {},
+    }
+
+
+# Per-worker state, set up by init_worker
+_worker = {}
+
+
+def init_worker(secrets, latency, seed_rows, notes_chars, seed, outage, cooldown):
+    """
+    Point storage at a fake worksheet, then warm the app up once in this process.
+    outage: (start, end) seconds of simulated outage, or None.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    import aggregates
+    import archive
+    import configuration
+    import feedback_storage
+
+    configuration.APP_EXPIRATION_DATE = datetime.max
+    feedback_storage.SHEETS_COOLDOWN_SECONDS = cooldown
+    scratch_dir = Path(tempfile.mkdtemp())
+    aggregates.AGGREGATES_PATH = scratch_dir / "aggregates.json"
+    archive.ARCHIVE_DIR = scratch_dir / "archive"
+    rng = random.Random(seed)
+    worksheet = FakeWorksheet(
+        seed_sheet_values(seed_rows, notes_chars, rng), latency, outage
+    )
+
+    def fake_get_gsheet(*args, **kwargs):
+        # Opening the spreadsheet is a round trip of its own
+        worksheet._call()
+        return worksheet
+
+    feedback_storage.get_gsheet = fake_get_gsheet
+    _worker.update(secrets=secrets, worksheet=worksheet, rng=rng)
+
+    # The first run imports the app modules and hashes the passwords; it is a
+    # cold start and is not part of the measurements.
+    warmup = AppTest.from_file(APP_PATH, default_timeout=120)
+    warmup.secrets.update(secrets)
+    warmup.run()
+
+
+def sync_candidate_radio(at):
+    """
+    Point the candidate radio back at the selected candidate. Its labels carry the
+    feedback status, which the auto-save can change during the run that rendered
+    them, leaving AppTest holding a value that is no longer one of the options.
+    """
+    radios = [r for r in at.radio if r.key == "candidate_radio"]
+    if not radios or "selected_candidate_name" not in at.session_state:
+        return
+    name = at.session_state["selected_candidate_name"]
+    radio = radios[0]
+    radio.set_value(next(o for o in radio.options if o.startswith(f"{name} ")))
+
+
+def timed_run(session, action):
+    """Run one rerun-triggering action and record its latency."""
+    sync_candidate_radio(session["at"])
+    start = time.perf_counter()
+    action().run()
+    session["latencies"].append(time.perf_counter() - start)
+    if session["at"].exception:
+        session["errors"] += len(session["at"].exception)
+
+
+def login(session, username):
+    at = session["at"]
+    timed_run(session, lambda: at)
+    inputs = {ti.label: ti for ti in at.text_input}
+    inputs["Username"].input(username)
+    inputs["Password"].input(PASSWORD)
+    login_button = next(b for b in at.button if b.label == "Login")
+    timed_run(session, login_button.click)
+
+
+def panelist_script(session, username, notes_chars, rng):
+    """Login, then for each candidate: pick it, type notes, rate, submit, view tabs."""
+    from rubric import get_rubric
+
+    at = session["at"]
+    login(session, username)
+    for index, cid in enumerate(get_rubric().candidates):
+        radio = at.radio(key="candidate_radio")
+        timed_run(session, lambda: radio.set_value(radio.options[index]))
+        if not [b for b in at.button if b.key == f"submit_{cid}"]:
+            # Read-only while storage is down: the form cannot be edited
+            session["read_only_skips"] += 1
+            continue
+        for area in list(at.text_area)[:3]:
+            timed_run(session, lambda: area.input(random_notes(rng, notes_chars)))
+        for box in list(at.selectbox)[:3]:
+            timed_run(session, lambda: box.set_value(rng.choice(box.options[1:])))
+        timed_run(session, at.button(key=f"submit_{cid}").click)
+        # st.rerun() after submit lands on the feedback tabs
+        timed_run(session, lambda: at)
+
+
+def admin_script(session, username, views):
+    """Login, then rerun the dashboard a few times as an admin browsing it would."""
+    at = session["at"]
+    login(session, username)
+    for _ in range(views):
+        timed_run(session, lambda: at)
+
+
+def run_session(kind, username, notes_chars, admin_views, trace_memory):
+    """Run one scripted session in this worker and return its measurements."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.secrets.update(_worker["secrets"])
+    session = {"at": at, "latencies": [], "errors": 0, "read_only_skips": 0}
+    worksheet = _worker["worksheet"]
+    calls_before = worksheet.calls
+    failed_before = worksheet.failed_calls
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        if kind == "admin":
+            admin_script(session, username, admin_views)
+        else:
+            panelist_script(session, username, notes_chars, _worker["rng"])
+    except Exception as e:  # a broken session is a result, not a harness crash
+        session["errors"] += 1
+        session["failure"] = f"{type(e).__name__}: {e}"
+    heap_peak = 0
+    if trace_memory:
+        heap_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        "kind": kind,
+        "username": username,
+        "latencies": session["latencies"],
+        "errors": session["errors"],
+        "failure": session.get("failure", ""),
+        "storage_calls": worksheet.calls - calls_before,
+        "failed_calls": worksheet.failed_calls - failed_before,
+        "read_only_skips": session["read_only_skips"],
+        "heap_peak": heap_peak,
+        # ru_maxrss is in KiB on Linux
+        "rss_peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def summarize(results, elapsed):
+    """Print latency percentiles, storage calls per session and peak memory."""
+    print(f"\nSessions: {len(results)} in {elapsed:.1f}s")
+    for kind in ("panelist", "admin"):
+        kind_results = [r for r in results if r["kind"] == kind]
+        if not kind_results:
+            continue
+        latencies = np.array([x for r in kind_results for x in r["latencies"]])
+        calls = np.array([r["storage_calls"] for r in kind_results])
+        print(f"\n{kind} sessions: {len(kind_results)}")
+        if latencies.size:
+            p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99]) * 1000
+            print(
+                f"  rerun latency ms: p50={p50:.0f} p90={p90:.0f} p95={p95:.0f} "
+                f"p99={p99:.0f} max={latencies.max() * 1000:.0f} (n={latencies.size})"
+            )
+        print(f"  storage calls/session: mean={calls.mean():.1f} max={calls.max()}")
+        failed = sum(r["failed_calls"] for r in kind_results)
+        if failed:
+            skips = sum(r["read_only_skips"] for r in kind_results)
+            print(
+                f"  failed storage calls: {failed}, read-only candidates skipped: {skips}"
+            )
+        errors = sum(r["errors"] for r in kind_results)
+        print(f"  errors: {errors}")
+        for r in kind_results:
+            if r["failure"]:
+                print(f"    {r['username']}: {r['failure']}")
+    rss = max(r["rss_peak"] for r in results)
+    print(f"\npeak worker RSS: {rss / 2**20:.0f} MiB")
+    heap = max(r["heap_peak"] for r in results)
+    if heap:
+        print(f"peak Python heap per session: {heap / 2**20:.1f} MiB")
+    print(
+        "\nNote: each worker process ran its sessions one at a time on its own copy "
+        "of the sheet, so these are per-session costs, not the capacity of one app "
+        "instance serving concurrent sessions."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--panelists", type=int, default=10)
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--latency-ms", type=float, default=100, help="fake storage latency per call"
+    )
+    parser.add_argument(
+        "--seed-rows", type=int, default=200, help="past feedback rows in the sheet"
+    )
+    parser.add_argument("--notes-chars", type=int, default=300)
+    parser.add_argument("--admin-views", type=int, default=3)
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="also report per-session Python heap peak (slower)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--outage-start-s",
+        type=float,
+        default=0,
+        help="seconds after worker start when the simulated outage begins",
+    )
+    parser.add_argument(
+        "--outage-s", type=float, default=0, help="simulated outage length"
+    )
+    parser.add_argument(
+        "--cooldown-s",
+        type=float,
+        default=30,
+        help="circuit breaker cooldown before probing storage again",
+    )
+    args = parser.parse_args()
+
+    # AppTest replaces sys.modules["__main__"] with app.py inside the workers, so
+    # hand the pool functions by this module's importable name instead.
+    import load_test
+
+    panelists = [f"panelist_{i}" for i in range(args.panelists)]
+    jobs = [("panelist", u) for u in panelists]
+    jobs += [("admin", ADMIN_USERNAME)] * args.admins
+    init_args = (
+        build_secrets(panelists),
+        args.latency_ms / 1000,
+        args.seed_rows,
+        args.notes_chars,
+        args.seed,
+        (
+            (args.outage_start_s, args.outage_start_s + args.outage_s)
+            if args.outage_s
+            else None
+        ),
+        args.cooldown_s,
+    )
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=load_test.init_worker, initargs=init_args
+    ) as pool:
+        futures = [
+            pool.submit(
+                load_test.run_session,
+                kind,
+                username,
+                args.notes_chars,
+                args.admin_views,
+                args.trace_memory,
+            )
+            for kind, username in jobs
+        ]
+        results = [f.result() for f in futures]
+    summarize(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Full-text search over submitted feedback notes.
+
+An inverted index maps each word to the notes fields (overall or per-criterion
+notes of one interviewer/candidate entry) that contain it. It is built once from
+the full feedback, updated incrementally whenever an entry is saved, and shared by
+all sessions in the process. Saved entries' notes are also kept, with the time
+they were saved, so a rebuild from an earlier read can replay them.
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+OVERALL_FIELD = "Overall"
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_lock = threading.Lock()
+# "recent": (interviewer, candidate_id) -> (time.monotonic() saved, fields)
+_store = {"index": None, "recent": {}}
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return _TOKEN_RE.findall(str(text).casefold())
+
+
+def entry_fields(entry):
+    """
+    Return {field: text} for the non-empty notes of a submitted entry; field is
+    OVERALL_FIELD or the criterion name. Drafts are not searchable.
+    """
+    if not entry.get("submitted", False):
+        return {}
+    fields = {OVERALL_FIELD: entry.get("overall_notes", "")}
+    fields.update(entry.get("criteria_notes", {}))
+    return {field: text for field, text in fields.items() if str(text).strip()}
+
+
+def empty_index():
+    return {
+        # (interviewer, candidate_id, field) -> {"text": str, "length": int}
+        "docs": {},
+        # term -> {doc key: term frequency}
+        "postings": {},
+        # sorted terms, for prefix matching
+        "terms": [],
+        # (interviewer, candidate_id) -> indexed fields
+        "entries": {},
+    }
+
+
+def _remove_doc(index, key):
+    doc = index["docs"].pop(key, None)
+    if doc is None:
+        return
+    for term in set(tokenize(doc["text"])):
+        postings = index["postings"][term]
+        del postings[key]
+        if not postings:
+            del index["postings"][term]
+            del index["terms"][bisect_left(index["terms"], term)]
+
+
+def _add_doc(index, key, text):
+    tokens = tokenize(text)
+    index["docs"][key] = {"text": str(text), "length": len(tokens)}
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    for term, tf in counts.items():
+        if term not in index["postings"]:
+            index["postings"][term] = {}
+            insort(index["terms"], term)
+        index["postings"][term][key] = tf
+
+
+def _index_entry(index, interviewer, candidate_id, new_fields):
+    for field in index["entries"].pop((interviewer, candidate_id), ()):
+        key = (interviewer, candidate_id, field)
+        if index["docs"][key]["text"] != str(new_fields.get(field, "")):
+            _remove_doc(index, key)
+    for field, text in new_fields.items():
+        key = (interviewer, candidate_id, field)
+        if key not in index["docs"]:
+            _add_doc(index, key, text)
+    if new_fields:
+        index["entries"][(interviewer, candidate_id)] = list(new_fields)
+
+
+def rebuild_search_index(feedback, since=None):
+    """
+    Build the notes index from a full feedback dict, replacing the current one.
+    since: time.monotonic() when feedback was read; entries saved since then are
+    applied on top, as the read may predate them.
+    """
+    index = empty_index()
+    for interviewer, user_feedback in feedback.items():
+        for candidate_id, entry in user_feedback.items():
+            _index_entry(index, interviewer, candidate_id, entry_fields(entry))
+    with _lock:
+        if since is not None:
+            for key, (saved_at, fields) in _store["recent"].items():
+                if saved_at >= since:
+                    _index_entry(index, *key, fields)
+        _store["index"] = index
+
+
+def has_search_index():
+    return _store["index"] is not None
+
+
+def index_entry_notes(interviewer, candidate_id, entry):
+    """
+    Update the index for one saved entry, once the index has been built.
+    """
+    fields = entry_fields(entry)
+    with _lock:
+        _store["recent"][(interviewer, candidate_id)] = (time.monotonic(), fields)
+        if _store["index"] is not None:
+            _index_entry(_store["index"], interviewer, candidate_id, fields)
+
+
+def _matching_terms(terms, prefix):
+    """Return the indexed terms starting with prefix."""
+    start = bisect_left(terms, prefix)
+    end = start
+    while end < len(terms) and terms[end].startswith(prefix):
+        end += 1
+    return terms[start:end]
+
+
+def search_notes(query, limit=50):
+    """
+    Return up to limit hits for query, best first, as (score, interviewer,
+    candidate_id, field, text) tuples. Each query word matches indexed words it
+    is a prefix of; fields are ranked by tf-idf, normalized by field length.
+    """
+    words = set(tokenize(query))
+    if not words:
+        return []
+    with _lock:
+        index = _store["index"]
+        if index is None:
+            return []
+        n_docs = len(index["docs"])
+        scores = {}
+        for word in words:
+            for term in _matching_terms(index["terms"], word):
+                postings = index["postings"][term]
+                idf = math.log(1 + n_docs / len(postings))
+                for key, tf in postings.items():
+                    scores[key] = scores.get(key, 0.0) + tf * idf
+        best = heapq.nlargest(
+            limit,
+            (
+                (score / math.sqrt(index["docs"][key]["length"]), key)
+                for key, score in scores.items()
+            ),
+        )
+        return [(score, *key, index["docs"][key]["text"]) for score, key in best]
@@ -0,0 +1,210 @@
+"""
+Interview rubric (candidates, criteria, ratings) loaded from an external YAML/JSON file.
+
+The file is validated and precompiled once into a Rubric holding everything the
+app derives from it (rating map, sheet headers, criterion HTML, widget keys).
+get_rubric() checks the file's modification time on each call and reloads it
+when it changes, so edits apply without restarting the server.
+"""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from html import escape
+
+import yaml
+
+from configuration import RUBRIC_PATH
+
+logger = logging.getLogger(__name__)
+
+BASE_HEADERS = [
+    "Interviewer",
+    "Candidate_ID",
+    "Candidate_Name",
+    "Submitted",
+    "Overall_Rating",
+    "Overall_Notes",
+    "Timestamp",
+]
+
+
+def column_letter(n):
+    """Return the A1-notation column letter(s) for a 1-based column number."""
+    letters = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+@dataclass(frozen=True)
+class Rubric:
+    candidates: dict
+    criteria: dict
+    criteria_list: list
+    criteria_weights: dict
+    criteria_html: dict
+    rating_options: list
+    first_option: str
+    rating_map: dict
+    sheet_headers: list
+    last_column: str
+    version: int
+    _widget_keys: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def widget_keys(self, candidate_id, username):
+        """
+        Return the Streamlit widget keys for one user's form for one candidate.
+        """
+        cache_key = (candidate_id, username)
+        keys = self._widget_keys.get(cache_key)
+        if keys is None:
+            suffix = f"{candidate_id}_{username}"
+            keys = {
+                "overall_rating": f"overall_rating_{suffix}",
+                "overall_notes": f"overall_notes_{suffix}",
+                "ratings": {crit: f"r_{crit}_{suffix}" for crit in self.criteria_list},
+                "notes": {crit: f"n_{crit}_{suffix}" for crit in self.criteria_list},
+            }
+            self._widget_keys[cache_key] = keys
+        return keys
+
+
+def _validate_ratings(ratings, path):
+    if (
+        not isinstance(ratings, list)
+        or len(ratings) < 2
+        or not all(isinstance(r, str) and r for r in ratings)
+    ):
+        raise ValueError(f"{path}: 'ratings' must be a list of at least two names")
+    if len(set(ratings)) != len(ratings):
+        raise ValueError(f"{path}: 'ratings' contains duplicates")
+    return list(ratings)
+
+
+def _validate_candidates(candidates, path):
+    if not isinstance(candidates, dict) or not candidates:
+        raise ValueError(f"{path}: 'candidates' must be a non-empty id: name mapping")
+    result = {}
+    for cid, name in candidates.items():
+        cid = str(cid)
+        if cid in result:
+            raise ValueError(f"{path}: duplicate candidate id {cid!r}")
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"{path}: candidate {cid!r} needs a name")
+        result[cid] = name
+    return result
+
+
+def _validate_criterion(crit, spec, path):
+    """Return (description, weight) for one criterion entry."""
+    weight = 1.0
+    if isinstance(spec, dict):
+        unknown = set(spec) - {"description", "weight"}
+        if unknown:
+            raise ValueError(f"{path}: criterion {crit!r} has unknown keys {unknown}")
+        weight = spec.get("weight", 1.0)
+        if (
+            isinstance(weight, bool)
+            or not isinstance(weight, (int, float))
+            or weight <= 0
+        ):
+            raise ValueError(f"{path}: criterion {crit!r} weight must be positive")
+        spec = spec.get("description", "")
+    if isinstance(spec, list):
+        if not all(isinstance(item, str) for item in spec):
+            raise ValueError(f"{path}: criterion {crit!r} bullets must be strings")
+    elif not isinstance(spec, str):
+        raise ValueError(f"{path}: criterion {crit!r} needs a description")
+    return spec, float(weight)
+
+
+def compile_rubric(data, path="rubric", version=0):
+    """
+    Validate parsed rubric data and precompute everything derived from it.
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a mapping at the top level")
+    for key in ("ratings", "candidates", "criteria"):
+        if key not in data:
+            raise ValueError(f"{path}: missing {key!r}")
+    rating_options = _validate_ratings(data["ratings"], path)
+    candidates = _validate_candidates(data["candidates"], path)
+    if not isinstance(data["criteria"], dict) or not data["criteria"]:
+        raise ValueError(f"{path}: 'criteria' must be a non-empty mapping")
+    criteria = {}
+    criteria_weights = {}
+    criteria_html = {}
+    for crit, spec in data["criteria"].items():
+        crit = str(crit)
+        desc, weight = _validate_criterion(crit, spec, path)
+        criteria[crit] = desc
+        criteria_weights[crit] = weight
+        criteria_html[crit] = (
+            "<ul style='margin-bottom:0;'>"
+            + "".join(f"<li>{escape(item)}</li>" for item in desc)
+            + "</ul>"
+            if isinstance(desc, list)
+            else None
+        )
+    criteria_list = list(criteria)
+    sheet_headers = (
+        BASE_HEADERS
+        + [f"CriteriaRating_{crit}" for crit in criteria_list]
+        + [f"CriteriaNotes_{crit}" for crit in criteria_list]
+    )
+    return Rubric(
+        candidates=candidates,
+        criteria=criteria,
+        criteria_list=criteria_list,
+        criteria_weights=criteria_weights,
+        criteria_html=criteria_html,
+        rating_options=rating_options,
+        first_option=rating_options[0],
+        rating_map={r: i for i, r in enumerate(rating_options[1:])},
+        sheet_headers=sheet_headers,
+        last_column=column_letter(len(sheet_headers)),
+        version=version,
+    )
+
+
+def load_rubric(path=RUBRIC_PATH):
+    """Read, validate and compile the rubric file at path."""
+    version = os.stat(path).st_mtime_ns
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    return compile_rubric(data, path, version)
+
+
+_lock = threading.Lock()
+_current = {"rubric": None, "mtime": None}
+
+
+def get_rubric(path=RUBRIC_PATH):
+    """
+    Return the compiled rubric, reloading it if the file changed since the last call.
+    An edit that fails validation, or a missing file, is logged and the last good
+    rubric is kept.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError as e:
+        if _current["rubric"] is None:
+            raise
+        logger.error("Keeping previous rubric; cannot read %s: %s", path, e)
+        return _current["rubric"]
+    if _current["rubric"] is not None and _current["mtime"] == mtime:
+        return _current["rubric"]
+    with _lock:
+        if _current["mtime"] != mtime:
+            try:
+                _current["rubric"] = load_rubric(path)
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                if _current["rubric"] is None:
+                    raise
+                logger.error("Keeping previous rubric; reload failed: %s", e)
+            _current["mtime"] = mtime
+    return _current["rubric"]
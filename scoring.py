@@ -0,0 +1,181 @@
+"""
+Vectorized scoring over the interviewer x candidate x criterion rating cube.
+
+Ratings are encoded once into a float array where the first rating option
+("I can't tell") and blank ratings are NaN; every statistic is then a masked
+reduction over that array.
+"""
+
+import numpy as np
+import streamlit as st
+
+
+def encode_rating_cube(
+    feedback, interviewers, candidate_ids, criteria_list, rating_map
+):
+    """
+    Encode submitted criteria ratings as an (interviewer, candidate, criterion) array.
+    rating_map gives the code of each counted rating; anything else is NaN.
+    """
+    user_pos = {u: i for i, u in enumerate(interviewers)}
+    cand_pos = {c: i for i, c in enumerate(candidate_ids)}
+    flat = np.full(len(interviewers) * len(candidate_ids) * len(criteria_list), np.nan)
+    codes = []
+    positions = []
+    for user, user_feedback in feedback.items():
+        if user not in user_pos:
+            continue
+        for cid, entry in user_feedback.items():
+            if cid not in cand_pos or not entry.get("submitted", False):
+                continue
+            base = (user_pos[user] * len(candidate_ids) + cand_pos[cid]) * len(
+                criteria_list
+            )
+            ratings = entry.get("criteria_ratings", {})
+            for k, crit in enumerate(criteria_list):
+                code = rating_map.get(ratings.get(crit, ""))
+                if code is not None:
+                    codes.append(code)
+                    positions.append(base + k)
+    if positions:
+        flat[positions] = codes
+    return flat.reshape(len(interviewers), len(candidate_ids), len(criteria_list))
+
+
+def criteria_weight_vector(criteria_list, criteria_weights):
+    """Return the configured weight of each criterion (default 1.0) as an array."""
+    return np.array([criteria_weights.get(crit, 1.0) for crit in criteria_list])
+
+
+def _masked_mean_std(values, mask, axis):
+    """Mean and population std of values where mask is set; NaN for empty slices."""
+    count = mask.sum(axis=axis)
+    filled = np.where(mask, values, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = filled.sum(axis=axis) / count
+        sq = np.where(mask, values**2, 0.0).sum(axis=axis) / count
+    var = np.clip(sq - mean**2, 0.0, None)
+    mean = np.where(count > 0, mean, np.nan)
+    var = np.where(count > 0, var, np.nan)
+    return mean, np.sqrt(var), count
+
+
+def entry_criteria_avg(entry, rubric):
+    """
+    Weighted criteria average of a single feedback entry, or None if nothing is rated.
+    """
+    ratings = entry.get("criteria_ratings", {})
+    codes = np.array(
+        [
+            rubric.rating_map.get(ratings.get(crit, ""), np.nan)
+            for crit in rubric.criteria_list
+        ],
+        dtype=float,
+    )
+    weights = criteria_weight_vector(rubric.criteria_list, rubric.criteria_weights)
+    avg = weighted_criteria_avg(codes, weights)
+    return None if np.isnan(avg) else round(float(avg), 2)
+
+
+def weighted_criteria_avg(cube, weights):
+    """Weighted mean over the criterion axis, ignoring NaN ratings."""
+    mask = ~np.isnan(cube)
+    w = np.where(mask, weights, 0.0)
+    total = w.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg = (np.where(mask, cube, 0.0) * w).sum(axis=-1) / total
+    return np.where(total > 0, avg, np.nan)
+
+
+def calibrate_by_interviewer(cube):
+    """
+    Convert ratings to per-interviewer z-scores so harsh and lenient raters are comparable.
+    Returns (z_cube, interviewer_mean, interviewer_std).
+    """
+    mask = ~np.isnan(cube)
+    mean, std, _ = _masked_mean_std(cube, mask, axis=(1, 2))
+    safe_std = np.where(std > 0, std, np.nan)
+    z = (cube - mean[:, None, None]) / safe_std[:, None, None]
+    # A rater who gives the same rating everywhere is neither harsh nor lenient
+    z = np.where(mask & np.isnan(z), 0.0, z)
+    return z, mean, std
+
+
+def inter_rater_agreement(cube, n_levels):
+    """
+    Observed pairwise agreement per (candidate, criterion): the share of rater
+    pairs that gave the identical rating. NaN when fewer than two raters.
+    """
+    levels = np.arange(n_levels)
+    counts = (cube[..., None] == levels).sum(axis=0)
+    n = counts.sum(axis=-1)
+    pairs = n * (n - 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        agreement = (counts * (counts - 1)).sum(axis=-1) / pairs
+    return np.where(n >= 2, agreement, np.nan)
+
+
+def compute_scores(feedback, rubric):
+    """
+    Compute all scoring statistics for submitted feedback in one pass over the rating cube.
+    Returns a dict of arrays indexed by the returned interviewer/candidate/criteria order.
+    """
+    interviewers = sorted(feedback.keys())
+    # Rubric candidates first, then any others with feedback (removed from the
+    # rubric, or archived), so their entries are still scored
+    candidate_ids = list(rubric.candidates)
+    candidate_ids += sorted(
+        {cid for user_feedback in feedback.values() for cid in user_feedback}
+        - set(candidate_ids)
+    )
+    criteria_list = rubric.criteria_list
+    cube = encode_rating_cube(
+        feedback, interviewers, candidate_ids, criteria_list, rubric.rating_map
+    )
+    weights = criteria_weight_vector(criteria_list, rubric.criteria_weights)
+    z_cube, rater_mean, rater_std = calibrate_by_interviewer(cube)
+    mask = ~np.isnan(cube)
+    crit_mean, crit_std, crit_count = _masked_mean_std(cube, mask, axis=0)
+    return {
+        "interviewers": interviewers,
+        "candidate_ids": candidate_ids,
+        "interviewer_index": {u: i for i, u in enumerate(interviewers)},
+        "candidate_index": {c: i for i, c in enumerate(candidate_ids)},
+        "criteria": criteria_list,
+        "cube": cube,
+        "criteria_avg": weighted_criteria_avg(cube, weights),
+        "calibrated_avg": weighted_criteria_avg(z_cube, weights),
+        "interviewer_mean": rater_mean,
+        "interviewer_std": rater_std,
+        "interviewer_count": mask.sum(axis=(1, 2)),
+        "criterion_mean": crit_mean,
+        "criterion_variance": crit_std**2,
+        "criterion_count": crit_count,
+        "agreement": inter_rater_agreement(cube, len(rubric.rating_map)),
+    }
+
+
+def get_scores(feedback, rubric, feedback_version):
+    """
+    Return compute_scores() results, cached in session_state by feedback and rubric version.
+    """
+    key = (feedback_version, rubric.version)
+    cached = st.session_state.get("_cached_scores")
+    if cached and cached[0] == key:
+        return cached[1]
+    scores = compute_scores(feedback, rubric)
+    st.session_state["_cached_scores"] = (key, scores)
+    return scores
+
+
+def entry_score(scores, array_name, interviewer, candidate_id):
+    """
+    Look up a per-(interviewer, candidate) score, rounded to 2 places, or "" if missing.
+    """
+    i = scores["interviewer_index"].get(interviewer)
+    c = scores["candidate_index"].get(candidate_id)
+    if i is None or c is None:
+        return ""
+    value = scores[array_name][i, c]
+    # Adding 0.0 turns a rounded -0.0 into 0.0 for display
+    return "" if np.isnan(value) else round(float(value), 2) + 0.0
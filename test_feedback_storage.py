@@ -0,0 +1,466 @@
+"""
+Tests for feedback_storage: the Google Sheets circuit breaker and the flush of
+held writes, compaction and column migration, and which rows a panelist loads.
+
+Run with: python -m pytest test_feedback_storage.py
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+
+import pytest
+import requests
+from gspread.exceptions import APIError
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+import aggregates
+import archive
+import feedback_storage
+import notes_search
+from load_test import FakeWorksheet
+from rubric import get_rubric
+
+
+class FlakyWorksheet(FakeWorksheet):
+    """
+    FakeWorksheet whose calls raise `error` while it is set. Set `gate` to an
+    Event to make the next write wait for it (`writing` is set meanwhile).
+    """
+
+    def __init__(self, values=None):
+        super().__init__(values if values is not None else [], 0)
+        self.error = None
+        self.gate = None
+        self.writing = threading.Event()
+
+    def _call(self):
+        super()._call()
+        if self.error is not None:
+            raise self.error
+
+    def _wait_for_gate(self):
+        gate, self.gate = self.gate, None
+        if gate is not None:
+            self.writing.set()
+            gate.wait(timeout=10)
+
+    def append_row(self, row):
+        self._wait_for_gate()
+        super().append_row(row)
+
+    def update(self, range_name, rows):
+        self._wait_for_gate()
+        super().update(range_name, rows)
+
+
+def api_error(status):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(
+        {"error": {"code": status, "message": "test", "status": "TEST"}}
+    ).encode()
+    return APIError(response)
+
+
+@pytest.fixture
+def sheet(monkeypatch, tmp_path):
+    worksheet = FlakyWorksheet()
+
+    def fake_get_gsheet():
+        worksheet._call()
+        return worksheet
+
+    monkeypatch.setattr(feedback_storage, "get_gsheet", fake_get_gsheet)
+    monkeypatch.setattr(feedback_storage, "SHEETS_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(feedback_storage, "SHEETS_COOLDOWN_SECONDS", 30)
+    monkeypatch.setattr(
+        feedback_storage,
+        "_breaker",
+        {"state": "closed", "failures": 0, "opened_at": 0.0},
+    )
+    monkeypatch.setattr(feedback_storage, "_pending_writes", {})
+    monkeypatch.setattr(feedback_storage, "_failed_writes", [])
+    monkeypatch.setattr(feedback_storage, "_flusher", {"thread": None})
+    monkeypatch.setattr(feedback_storage, "_entry_locks", {})
+    monkeypatch.setattr(
+        feedback_storage, "_snapshot", {"entries": {}, "updated_at": ""}
+    )
+    monkeypatch.setattr(aggregates, "AGGREGATES_PATH", tmp_path / "aggregates.json")
+    monkeypatch.setattr(aggregates, "_store", {"aggregates": None, "recent": {}})
+    monkeypatch.setattr(notes_search, "_store", {"index": None, "recent": {}})
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / "archive")
+    monkeypatch.setattr(archive, "_cache", {"mtime": None, "records": []})
+    monkeypatch.setattr(feedback_storage, "APP_EXPIRATION_DATE", datetime.max)
+    return worksheet
+
+
+def read_sheet():
+    with feedback_storage._sheets_call():
+        return feedback_storage.get_gsheet().get_all_values()
+
+
+def trip(sheet):
+    sheet.error = RequestsConnectionError("down")
+    for _ in range(feedback_storage.SHEETS_FAILURE_THRESHOLD):
+        with pytest.raises(feedback_storage.StorageUnavailable):
+            read_sheet()
+
+
+def end_cooldown():
+    feedback_storage._breaker["opened_at"] -= feedback_storage.SHEETS_COOLDOWN_SECONDS
+
+
+def wait_for_flush():
+    thread = feedback_storage._flusher["thread"]
+    if thread is not None:
+        thread.join(timeout=10)
+
+
+def entry(notes, submitted=False, timestamp="2026-01-01T00:00:00"):
+    return {"overall_notes": notes, "submitted": submitted, "timestamp": timestamp}
+
+
+def write(sheet, user, candidate_id, fb):
+    feedback_storage._write_entry(sheet, user, candidate_id, fb, get_rubric())
+
+
+def sheet_feedback(sheet):
+    return feedback_storage._values_to_feedback(sheet.values[0], sheet.values[1:])
+
+
+def save_in_background(fb):
+    thread = threading.Thread(
+        target=feedback_storage.save_feedback,
+        args=({"alice": {"1": fb}}, "alice", "1", get_rubric()),
+    )
+    thread.start()
+    return thread
+
+
+def test_breaker_opens_after_consecutive_outages_and_fails_fast(sheet):
+    trip(sheet)
+    assert feedback_storage._breaker["state"] == "open"
+    calls = sheet.calls
+    with pytest.raises(feedback_storage.StorageUnavailable):
+        read_sheet()
+    assert sheet.calls == calls
+
+
+def test_success_resets_failure_count(sheet):
+    sheet.error = RequestsConnectionError("down")
+    for _ in range(feedback_storage.SHEETS_FAILURE_THRESHOLD - 1):
+        with pytest.raises(feedback_storage.StorageUnavailable):
+            read_sheet()
+    sheet.error = None
+    read_sheet()
+    assert feedback_storage._breaker == {
+        **feedback_storage._breaker,
+        "state": "closed",
+        "failures": 0,
+    }
+
+
+def test_client_errors_do_not_trip_the_breaker(sheet):
+    sheet.error = api_error(400)
+    for _ in range(feedback_storage.SHEETS_FAILURE_THRESHOLD + 1):
+        with pytest.raises(APIError):
+            read_sheet()
+    assert feedback_storage._breaker["state"] == "closed"
+
+
+def test_probe_after_cooldown_closes_the_breaker(sheet):
+    trip(sheet)
+    sheet.error = None
+    # Still cooling down: no probe is sent
+    assert not feedback_storage.check_storage()
+    end_cooldown()
+    assert feedback_storage.check_storage()
+    assert feedback_storage._breaker["state"] == "closed"
+
+
+def test_failed_probe_reopens_the_breaker(sheet):
+    trip(sheet)
+    end_cooldown()
+    with pytest.raises(feedback_storage.StorageUnavailable):
+        read_sheet()
+    assert feedback_storage._breaker["state"] == "open"
+    # The cooldown starts again from the failed probe
+    sheet.error = None
+    assert not feedback_storage.check_storage()
+
+
+def test_only_one_probe_while_half_open(sheet):
+    trip(sheet)
+    end_cooldown()
+    feedback_storage._allow_call()
+    assert feedback_storage._breaker["state"] == "half_open"
+    with pytest.raises(feedback_storage.StorageUnavailable):
+        feedback_storage._allow_call()
+
+
+def test_held_writes_flush_with_the_current_rubric(sheet):
+    feedback_storage._pending_writes[("alice", "1")] = entry("held")
+    read_sheet()
+    wait_for_flush()
+    assert not feedback_storage._pending_writes
+    assert sheet.values[0] == get_rubric().sheet_headers
+    assert sheet.values[1][:2] == ["alice", "1"]
+    assert sheet.values[1][5] == "held"
+
+
+def test_flush_stops_at_an_outage_and_keeps_entries(sheet):
+    feedback_storage._pending_writes[("alice", "1")] = entry("held")
+    feedback_storage._flush_lock.acquire()
+    sheet.error = RequestsConnectionError("down")
+    feedback_storage._flush_pending_writes()
+    assert ("alice", "1") in feedback_storage._pending_writes
+    assert not feedback_storage._failed_writes
+    assert not feedback_storage._flush_lock.locked()
+
+
+def test_rejected_held_write_is_dropped_without_raising(sheet, monkeypatch):
+    def reject(*args, **kwargs):
+        raise api_error(400)
+
+    monkeypatch.setattr(sheet, "append_row", reject)
+    feedback_storage._pending_writes[("alice", "1")] = entry("bad")
+    feedback_storage._pending_writes[("bob", "1")] = entry("also bad")
+    # The caller's own read succeeds and is not affected by the flush
+    assert read_sheet() == []
+    wait_for_flush()
+    assert not feedback_storage._pending_writes
+    assert [key for key, _ in feedback_storage._failed_writes] == [
+        ("alice", "1"),
+        ("bob", "1"),
+    ]
+    assert feedback_storage._breaker["state"] == "closed"
+    # Later calls are unaffected
+    assert read_sheet() == [get_rubric().sheet_headers]
+
+
+def save_during_flush(sheet, held, saved):
+    """
+    Hold `held`, let the background flush start writing it, then save `saved`
+    from another session while the flush write is still in flight.
+    """
+    feedback_storage._pending_writes[("alice", "1")] = held
+    gate = sheet.gate = threading.Event()
+    read_sheet()
+    assert sheet.writing.wait(timeout=10)
+    save = save_in_background(saved)
+    # Give the save the chance to write before the flush does
+    time.sleep(0.2)
+    gate.set()
+    save.join(timeout=10)
+    wait_for_flush()
+
+
+def test_save_waits_for_an_in_flight_flush_of_a_new_entry(sheet):
+    save_during_flush(sheet, entry("draft"), entry("final", submitted=True))
+    keys = [row[:2] for row in sheet.values[1:]]
+    assert keys == [["alice", "1"]]
+    saved = sheet_feedback(sheet)["alice"]["1"]
+    assert saved["submitted"] and saved["overall_notes"] == "final"
+    assert not feedback_storage._pending_writes
+
+
+def test_flush_does_not_overwrite_a_newer_save(sheet):
+    feedback_storage._pending_writes[("alice", "1")] = entry("first")
+    read_sheet()
+    wait_for_flush()
+    save_during_flush(sheet, entry("stale"), entry("newest", submitted=True))
+    assert len(sheet.values) == 2
+    assert sheet_feedback(sheet)["alice"]["1"]["overall_notes"] == "newest"
+
+
+def test_flush_skips_a_held_copy_saved_meanwhile(sheet):
+    feedback_storage._pending_writes[("alice", "1")] = entry("held")
+    # A save holds the entry's lock while the flush picks up the held copy
+    with feedback_storage._entry_lock(("alice", "1")):
+        read_sheet()
+        time.sleep(0.2)
+        with feedback_storage._lock:
+            del feedback_storage._pending_writes[("alice", "1")]
+        sheet.append_row(["alice", "1", "", True, "", "saved", ""])
+    wait_for_flush()
+    assert [row[5] for row in sheet.values] == ["saved"]
+
+
+def test_compaction_clears_rows_while_the_app_is_live(sheet):
+    write(sheet, "alice", "1", entry("a1", submitted=True))
+    write(sheet, "bob", "2", entry("b2", submitted=True))
+    write(sheet, "carol", "1", entry("c1"))
+    assert feedback_storage.compact_feedback(candidate_ids=["1"]) == 2
+    # Rows keep their positions; archived ones are blank
+    assert [row[:2] for row in sheet.values[1:]] == [[], ["bob", "2"], []]
+    write(sheet, "bob", "2", entry("b2 edited", submitted=True))
+    assert sheet.values[2][5] == "b2 edited"
+    assert set(sheet_feedback(sheet)) == {"bob"}
+    archived = feedback_storage._records_to_feedback(archive.load_archived_records())
+    assert archived["alice"]["1"]["overall_notes"] == "a1"
+    # Cleared rows are not archived again
+    assert feedback_storage.compact_feedback(archive_all=True) == 1
+
+
+def test_compaction_deletes_rows_once_the_app_has_expired(sheet, monkeypatch):
+    write(sheet, "alice", "1", entry("a1"))
+    write(sheet, "bob", "2", entry("b2"))
+    monkeypatch.setattr(feedback_storage, "APP_EXPIRATION_DATE", datetime.min)
+    assert feedback_storage.compact_feedback(candidate_ids=["1"]) == 1
+    assert [row[:2] for row in sheet.values[1:]] == [["bob", "2"]]
+
+
+def test_age_archives_only_candidates_with_no_recent_rows(sheet):
+    write(sheet, "alice", "1", entry("old", timestamp="2020-01-01T00:00:00"))
+    write(sheet, "bob", "1", entry("recent", timestamp="2026-01-01T00:00:00"))
+    write(sheet, "alice", "2", entry("old", timestamp="2020-01-01T00:00:00"))
+    write(sheet, "bob", "2", entry("old", timestamp="2020-02-01T00:00:00"))
+    before = datetime(2025, 1, 1)
+    assert feedback_storage.compact_feedback(before=before) == 2
+    assert [row[:2] for row in sheet.values[1:]] == [
+        ["alice", "1"],
+        ["bob", "1"],
+        [],
+        [],
+    ]
+
+
+def test_waiting_migration_does_not_revert_saves(sheet):
+    headers = get_rubric().sheet_headers
+    # The sheet still has the criteria columns in an older order
+    old_header = headers[:7] + headers[:6:-1]
+    sheet.values = [old_header, ["alice", "1"] + [""] * (len(old_header) - 2)]
+    sheet.values[1][old_header.index("CriteriaNotes_User research")] = "alice notes"
+    # The first session to save migrates the sheet, then writes its entry
+    write(sheet, "bob", "1", entry("bob notes"))
+    assert sheet.values[0][: len(headers)] == headers
+    # A session that read the old header before that migration, and then waited
+    # for the lock, must not rewrite the sheet from its read
+    feedback_storage._migrate_columns(sheet, headers)
+    feedback = sheet_feedback(sheet)
+    assert feedback["bob"]["1"]["overall_notes"] == "bob notes"
+    assert feedback["alice"]["1"]["criteria_notes"]["User research"] == "alice notes"
+
+
+def test_rebuilds_keep_saves_made_after_their_read(sheet):
+    write(sheet, "alice", "1", entry("first draft"))
+    read_at = time.monotonic()
+    feedback = sheet_feedback(sheet)
+    # Saved while the admin's rebuild is still working from the read above
+    submitted = entry("qualtrics recruitment", submitted=True)
+    feedback_storage.save_feedback(
+        {"alice": {"1": submitted}}, "alice", "1", get_rubric()
+    )
+    summary = feedback_storage.refresh_aggregates(feedback, get_rubric(), read_at)
+    assert summary["candidates"]["1"]["submitted"] == 1
+    notes_search.rebuild_search_index(feedback, read_at)
+    assert [hit[1:3] for hit in notes_search.search_notes("qualtrics")] == [
+        ("alice", "1")
+    ]
+
+
+def test_autosaves_only_persist_aggregates_when_counts_change(sheet, monkeypatch):
+    feedback_storage.refresh_aggregates({}, get_rubric())
+    persisted = []
+    monkeypatch.setattr(aggregates, "_persist", persisted.append)
+
+    def save(fb):
+        feedback_storage.save_feedback({"alice": {"1": fb}}, "alice", "1", get_rubric())
+
+    save(entry("a", timestamp="2026-01-01T00:00:01"))
+    save(entry("ab", timestamp="2026-01-01T00:00:02"))
+    save(entry("abc", timestamp="2026-01-01T00:00:03"))
+    assert len(persisted) == 1
+    save(entry("abc", submitted=True, timestamp="2026-01-01T00:00:04"))
+    assert len(persisted) == 2
+    statuses = aggregates.get_entry_statuses(["alice"], ["1"])
+    assert statuses["alice"]["1"]["timestamp"] == "2026-01-01T00:00:04"
+
+
+@pytest.fixture
+def panel(sheet):
+    """A sheet where alice has submitted candidate 1 and drafted candidate 2."""
+    write(sheet, "alice", "1", entry("alice 1", submitted=True))
+    write(sheet, "bob", "1", entry("bob 1", submitted=True))
+    write(sheet, "carol", "1", entry("carol 1 draft"))
+    write(sheet, "alice", "2", entry("alice 2 draft"))
+    write(sheet, "bob", "2", entry("bob 2", submitted=True))
+    write(sheet, "carol", "3", entry("carol 3", submitted=True))
+    return sheet
+
+
+def visible_keys(sheet, username, candidate_id=None):
+    header, rows = feedback_storage._load_visible_values(sheet, username, candidate_id)
+    feedback = feedback_storage._values_to_feedback(header, rows)
+    return sorted((user, cid) for user in feedback for cid in feedback[user])
+
+
+def test_panelist_sees_own_rows_and_submitted_rows_of_unlocked_candidates(panel):
+    panel.calls = 0
+    assert visible_keys(panel, "alice") == [
+        ("alice", "1"),
+        ("alice", "2"),
+        ("bob", "1"),
+    ]
+    # Only two reads: the key columns, then the selected rows
+    assert panel.calls == 2
+
+
+def test_locked_candidates_show_only_own_rows(panel):
+    assert visible_keys(panel, "dave") == []
+    # carol has only submitted candidate 3, which nobody else has
+    assert visible_keys(panel, "carol") == [("carol", "1"), ("carol", "3")]
+
+
+def test_unlocking_a_candidate_loads_only_its_other_submitted_rows(panel):
+    assert visible_keys(panel, "alice", "2") == [("bob", "2")]
+    assert visible_keys(panel, "alice", "3") == [("carol", "3")]
+    feedback = {"alice": {"2": entry("alice 2", submitted=True)}}
+    feedback_storage.load_unlocked_feedback(feedback, "alice", "2")
+    assert feedback["bob"]["2"]["overall_notes"] == "bob 2"
+    assert set(feedback) == {"alice", "bob"}
+
+
+def test_rows_that_move_after_the_key_read_fall_back_to_a_full_read(panel, monkeypatch):
+    batch_get = panel.batch_get
+
+    def shifting_batch_get(ranges):
+        result = batch_get(ranges)
+        if ranges[0] == "1:1":
+            # Someone sorts or inserts a row by hand between the two reads
+            panel.values.insert(1, ["carol", "2", "", "False", "", "carol 2 draft"])
+        return result
+
+    monkeypatch.setattr(panel, "batch_get", shifting_batch_get)
+    assert visible_keys(panel, "alice") == [
+        ("alice", "1"),
+        ("alice", "2"),
+        ("bob", "1"),
+    ]
+
+
+def test_cleared_rows_after_the_key_read_are_not_returned(panel, monkeypatch):
+    batch_get = panel.batch_get
+
+    def clearing_batch_get(ranges):
+        result = batch_get(ranges)
+        if ranges[0] == "1:1":
+            # An archive run clears bob's row between the two reads
+            panel.values[2] = []
+        return result
+
+    monkeypatch.setattr(panel, "batch_get", clearing_batch_get)
+    assert visible_keys(panel, "alice") == [("alice", "1"), ("alice", "2")]
+
+
+def test_unexpected_header_is_filtered_after_a_full_read(panel):
+    panel.values[0] = ["Candidate_ID", "Interviewer"] + panel.values[0][2:]
+    for row in panel.values[1:]:
+        row[0], row[1] = row[1], row[0]
+    assert visible_keys(panel, "alice") == [
+        ("alice", "1"),
+        ("alice", "2"),
+        ("bob", "1"),
+    ]
@@ -6,8 +6,12 @@ import streamlit as st
 from datetime import datetime
 import pandas as pd
 
-from feedback_storage import save_feedback, get_feedback_status
-from configuration import RATING_OPTIONS
+from feedback_storage import (
+    save_feedback,
+    get_feedback_status,
+    load_unlocked_feedback,
+    storage_read_only,
+)
 
 
 def format_timestamp(ts):
@@ -23,13 +27,13 @@ def format_timestamp(ts):
         return ts
 
 
-def render_feedback_table(feedback, criteria_dict, panelist=None):
+def render_feedback_table(feedback, criteria_list, panelist=None):
     """
     Render a feedback summary table for a given feedback dict and criteria.
     Shows panelist, criteria, rating, and notes in a dataframe.
     """
     rows = []
-    for crit in criteria_dict.keys():
+    for crit in criteria_list:
         rows.append(
             {
                 "Panelist": panelist if panelist else "",
@@ -42,7 +46,7 @@ def render_feedback_table(feedback, criteria_dict, panelist=None):
     st.dataframe(pd.DataFrame(rows), use_container_width=True)
 
 
-def show_feedback_form(candidate_id, candidate_choice, criteria, username):
+def show_feedback_form(candidate_id, candidate_choice, rubric, username):
     """
     Display the feedback form for a candidate, allowing the user to enter ratings and notes.
     Handles auto-saving and submission logic.
@@ -65,12 +69,14 @@ def show_feedback_form(candidate_id, candidate_choice, criteria, username):
             "**Last Modified At:**",
             format_timestamp(user_feedback.get("timestamp", "")),
         )
-        render_feedback_table(user_feedback, criteria)
+        render_feedback_table(user_feedback, rubric.criteria_list)
         return
-    rating_options = RATING_OPTIONS
-    overall_rating_key = f"overall_rating_{candidate_id_str}_{username}"
-    overall_notes_key = f"overall_notes_{candidate_id_str}_{username}"
-    prev_overall_rating = user_feedback.get("overall_rating", "I can't tell")
+    read_only = storage_read_only()
+    rating_options = rubric.rating_options
+    keys = rubric.widget_keys(candidate_id_str, username)
+    overall_rating_key = keys["overall_rating"]
+    overall_notes_key = keys["overall_notes"]
+    prev_overall_rating = user_feedback.get("overall_rating", rubric.first_option)
     prev_overall_notes = user_feedback.get("overall_notes", "")
     # Make Overall Rating header same size as criteria
     st.markdown("### Overall Rating")
@@ -83,29 +89,26 @@ def show_feedback_form(candidate_id, candidate_choice, criteria, username):
             else 0
         ),
         key=overall_rating_key,
+        disabled=read_only,
     )
     st.text_area(
         "Overall Notes",
         value=prev_overall_notes,
         key=overall_notes_key,
+        disabled=read_only,
     )
     ratings = {}
     notes = {}
-    for crit, desc in criteria.items():
+    for crit, desc in rubric.criteria.items():
         st.markdown(f"### {crit}")
-        if isinstance(desc, list):
-            st.markdown(
-                "<ul style='margin-bottom:0;'>"
-                + "".join([f"<li>{item}</li>" for item in desc])
-                + "</ul>",
-                unsafe_allow_html=True,
-            )
+        if rubric.criteria_html[crit] is not None:
+            st.markdown(rubric.criteria_html[crit], unsafe_allow_html=True)
         else:
             st.caption(desc)
-        crit_rating_key = f"r_{crit}_{candidate_id_str}_{username}"
-        crit_notes_key = f"n_{crit}_{candidate_id_str}_{username}"
+        crit_rating_key = keys["ratings"][crit]
+        crit_notes_key = keys["notes"][crit]
         prev_crit_rating = user_feedback.get("criteria_ratings", {}).get(
-            crit, "I can't tell"
+            crit, rubric.first_option
         )
         prev_crit_notes = user_feedback.get("criteria_notes", {}).get(crit, "")
         col1, col2 = st.columns([1, 2])
@@ -119,13 +122,18 @@ def show_feedback_form(candidate_id, candidate_choice, criteria, username):
                     else 0
                 ),
                 key=crit_rating_key,
+                disabled=read_only,
             )
         with col2:
             notes[crit] = st.text_area(
                 f"Notes for {crit}",
                 value=prev_crit_notes,
                 key=crit_notes_key,
+                disabled=read_only,
             )
+    if read_only:
+        # Nothing can change, so there is nothing to save or submit
+        return
     if username not in st.session_state["feedback"]:
         st.session_state["feedback"][username] = {}
     prev_submitted = (
@@ -138,19 +146,15 @@ def show_feedback_form(candidate_id, candidate_choice, criteria, username):
         "overall_rating": st.session_state[overall_rating_key],
         "overall_notes": st.session_state[overall_notes_key],
         "criteria_ratings": {
-            crit: st.session_state[f"r_{crit}_{candidate_id_str}_{username}"]
-            for crit in criteria
+            crit: st.session_state[key] for crit, key in keys["ratings"].items()
         },
         "criteria_notes": {
-            crit: st.session_state[f"n_{crit}_{candidate_id_str}_{username}"]
-            for crit in criteria
+            crit: st.session_state[key] for crit, key in keys["notes"].items()
         },
         "timestamp": datetime.now().isoformat(),
         "submitted": prev_submitted,
     }
-    save_feedback(
-        st.session_state["feedback"], username, candidate_id_str, list(criteria.keys())
-    )
+    save_feedback(st.session_state["feedback"], username, candidate_id_str, rubric)
     st.markdown(
         """
         <style>
@@ -174,15 +178,16 @@ def show_feedback_form(candidate_id, candidate_choice, criteria, username):
             st.session_state["feedback"],
             username,
             candidate_id_str,
-            list(criteria.keys()),
+            rubric,
         )
+        load_unlocked_feedback(st.session_state["feedback"], username, candidate_id_str)
         st.success(
             "Feedback submitted! You can now view others' feedback for this candidate."
         )
         st.rerun()
 
 
-def show_feedback_tabs(candidates, criteria, username):
+def show_feedback_tabs(candidates, rubric, username):
     """
     Display feedback tabs for all candidates that have been submitted by the user.
     Shows both the user's and other panelists' feedback for each candidate.
@@ -205,7 +210,7 @@ def show_feedback_tabs(candidates, criteria, username):
                         "**Last Modified At:**",
                         format_timestamp(user_feedback.get("timestamp", "")),
                     )
-                    render_feedback_table(user_feedback, criteria, username)
+                    render_feedback_table(user_feedback, rubric.criteria_list, username)
                 st.subheader("Other Panelists' Feedback", anchor=None)
                 other_feedback_found = False
                 for uname, fb in st.session_state["feedback"].items():
@@ -224,7 +229,7 @@ def show_feedback_tabs(candidates, criteria, username):
                             "Last Modified At:",
                             format_timestamp(fb[cid_str].get("timestamp", "")),
                         )
-                        render_feedback_table(fb[cid_str], criteria, uname)
+                        render_feedback_table(fb[cid_str], rubric.criteria_list, uname)
                         st.write("---")
                 if not other_feedback_found:
                     st.write("No other feedback available yet.")
@@ -46,15 +46,15 @@ def select_candidate_main(candidates_dict):
     return cid_str, cname
 
 
-def show_user_panel(username, candidates, criteria):
+def show_user_panel(username, rubric):
     st.sidebar.title(f"Welcome {username}")
-    candidate_id_str, candidate_choice = select_candidate_main(candidates)
+    candidate_id_str, candidate_choice = select_candidate_main(rubric.candidates)
 
     user_feedback = (
         st.session_state["feedback"].get(username, {}).get(candidate_id_str, {})
     )
     if get_feedback_status(user_feedback) != "submitted":
-        show_feedback_form(candidate_id_str, candidate_choice, criteria, username)
+        show_feedback_form(candidate_id_str, candidate_choice, rubric, username)
     else:
         st.success("You have submitted feedback for this candidate.")
-    show_feedback_tabs({candidate_id_str: candidate_choice}, criteria, username)
+    show_feedback_tabs({candidate_id_str: candidate_choice}, rubric, username)